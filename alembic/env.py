@@ -1,11 +1,15 @@
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config
+from sqlalchemy import engine_from_config, event
 from sqlalchemy import pool
+from sqlalchemy.engine import make_url
 
 from alembic import context
 
+from config import settings
 from database import Base
+from services.sqlite import set_pragmas
+from sharding import parse_shard_urls
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -27,6 +31,46 @@ target_metadata = Base.metadata
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
 
+# async-драйвери застосунку -> sync-драйвери для міграцій
+SYNC_DRIVERS = {"asyncpg": "psycopg2", "aiosqlite": "pysqlite"}
+
+
+def sync_url(url: str) -> str:
+    url = make_url(url)
+    driver = SYNC_DRIVERS.get(url.get_driver_name())
+    if driver:
+        url = url.set(drivername=f"{url.get_backend_name()}+{driver}")
+    return url.render_as_string(hide_password=False)
+
+
+def database_url() -> str:
+    """URL бази: `alembic -x url=...`, інакше DATABASE_URL застосунку."""
+    url = context.get_x_argument(as_dictionary=True).get("url")
+    return sync_url(url or settings.DATABASE_URL)
+
+
+def targets() -> list[tuple[str | None, str]]:
+    """(шард, url) для міграції: primary (шард None), далі кожен шард.
+
+    `-x url=...` мігрує тільки цю базу як primary, `-x shard=<name>` —
+    тільки один шард. Шард з URL primary окремо не мігрує.
+    """
+    args = context.get_x_argument(as_dictionary=True)
+    if "url" in args:
+        return [(None, database_url())]
+    shards = {
+        name: url
+        for name, url in parse_shard_urls(settings.DATABASE_SHARD_URLS).items()
+        if url != settings.DATABASE_URL
+    }
+    if "shard" in args:
+        if args["shard"] not in shards:
+            raise SystemExit(f"Unknown shard {args['shard']!r}")
+        return [(args["shard"], sync_url(shards[args["shard"]]))]
+    return [(None, database_url())] + [
+        (name, sync_url(url)) for name, url in shards.items()
+    ]
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
@@ -39,11 +83,15 @@ def run_migrations_offline() -> None:
     Calls to context.execute() here emit the given string to the
     script output.
 
+    Шарди — тільки online: їхні міграції перевіряють наявну схему.
     """
-    url = config.get_main_option("sqlalchemy.url")
+    if "shard" in context.get_x_argument(as_dictionary=True):
+        raise SystemExit("Shard migrations need a database connection")
+    url = database_url()
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        render_as_batch=url.startswith("sqlite"),
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -59,14 +107,31 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    for shard, url in targets():
+        # міграції читають ім'я шарда через sharding.migrating_shard()
+        config.attributes["shard"] = shard
+        run_migrations_on(url)
+
+
+def run_migrations_on(url: str) -> None:
+    section = config.get_section(config.config_ini_section, {})
+    section["sqlalchemy.url"] = url
     connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
+        section,
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
+    sqlite = connectable.dialect.name == "sqlite"
+    if sqlite:
+        event.listen(connectable, "connect", set_pragmas)
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        # SQLite не вміє більшість ALTER TABLE — batch-режим перебудовує таблицю
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=sqlite,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,133 @@
+"""Owner-scoped contacts schema and indexes
+
+Revision ID: 5d1e7a3c9b42
+Revises: cb9e366a1eaf
+Create Date: 2026-10-19 12:00:00.000000
+
+Creates ``users``, ``contacts`` and ``owner_shards`` with owner-scoped
+indexes instead of the global unique index on ``contacts.email``.
+
+A database built by the original application's ``create_all`` (stamped
+with ``alembic stamp cb9e366a1eaf``, see there) already has ``users`` and
+``contacts``: the tables are kept, ``ix_contacts_email`` is dropped and
+the owner-scoped indexes and ``owner_shards`` are added. Downgrade drops
+all three tables.
+
+On a shard only ``contacts`` is handled, without the foreign key to
+``users``; ``create_shard_schemas`` may have built it already.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sharding import migrating_shard
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5d1e7a3c9b42"
+down_revision: Union[str, Sequence[str], None] = "cb9e366a1eaf"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_users() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(length=200), nullable=False),
+        sa.Column("full_name", sa.String(length=200), nullable=True),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_verified", sa.Boolean(), nullable=True),
+        sa.Column("avatar_url", sa.String(length=512), nullable=True),
+        sa.Column("verification_token", sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_users_id"), "users", ["id"], unique=False)
+    op.create_index(op.f("ix_users_email"), "users", ["email"], unique=True)
+
+
+def _create_contacts(owner_fk: bool) -> None:
+    # на шарді таблиці users немає (sharding.shard_contacts_table)
+    foreign_keys = (
+        [sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE")]
+        if owner_fk
+        else []
+    )
+    op.create_table(
+        "contacts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(length=100), nullable=False),
+        sa.Column("last_name", sa.String(length=100), nullable=False),
+        sa.Column("email", sa.String(length=200), nullable=False),
+        sa.Column("phone", sa.String(length=50), nullable=False),
+        sa.Column("date_of_birth", sa.Date(), nullable=False),
+        sa.Column("information", sa.String(), nullable=True),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        *foreign_keys,
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def _contact_indexes(existing: set[str]) -> None:
+    # глобальна унікальність email (create_all першої версії) -> у межах власника
+    if "ix_contacts_email" in existing:
+        op.drop_index("ix_contacts_email", table_name="contacts")
+    if "ix_contacts_id" not in existing:
+        op.create_index(op.f("ix_contacts_id"), "contacts", ["id"], unique=False)
+    if "ix_contacts_owner_name" not in existing:
+        op.create_index(
+            "ix_contacts_owner_name",
+            "contacts",
+            ["owner_id", "last_name", "first_name"],
+            unique=False,
+        )
+    if "uq_contacts_owner_email" not in existing:
+        op.create_index(
+            "uq_contacts_owner_email", "contacts", ["owner_id", "email"], unique=True
+        )
+
+
+def _create_owner_shards() -> None:
+    op.create_table(
+        "owner_shards",
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("shard", sa.String(length=32), nullable=False),
+        sa.Column("read_only", sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("owner_id"),
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    shard = migrating_shard()
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    if not shard and "users" not in tables:
+        _create_users()
+    if "contacts" in tables:
+        _contact_indexes({i["name"] for i in inspector.get_indexes("contacts")})
+    else:
+        _create_contacts(owner_fk=not shard)
+        _contact_indexes(set())
+    if not shard and "owner_shards" not in tables:
+        _create_owner_shards()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    shard = migrating_shard()
+    if not shard:
+        op.drop_table("owner_shards")
+    op.drop_index("uq_contacts_owner_email", table_name="contacts")
+    op.drop_index("ix_contacts_owner_name", table_name="contacts")
+    op.drop_index(op.f("ix_contacts_id"), table_name="contacts")
+    op.drop_table("contacts")
+    if shard:
+        return
+    op.drop_index(op.f("ix_users_email"), table_name="users")
+    op.drop_index(op.f("ix_users_id"), table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,49 @@
+"""Birthday digest checkpoints
+
+Revision ID: 8a4c2e6f1d07
+Revises: 5d1e7a3c9b42
+Create Date: 2026-10-19 13:00:00.000000
+
+Digest tables live only in the primary database; shards skip this revision.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sharding import migrating_shard
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8a4c2e6f1d07"
+down_revision: Union[str, Sequence[str], None] = "5d1e7a3c9b42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if migrating_shard():
+        return
+    op.create_table(
+        "digest_checkpoints",
+        sa.Column("run_date", sa.Date(), nullable=False),
+        sa.Column("shard", sa.String(length=32), nullable=False),
+        sa.Column("last_owner_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("run_date", "shard"),
+    )
+    op.create_table(
+        "digest_log",
+        sa.Column("run_date", sa.Date(), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("run_date", "owner_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if migrating_shard():
+        return
+    op.drop_table("digest_log")
+    op.drop_table("digest_checkpoints")
@@ -0,0 +1,252 @@
+"""Hash partitioning of contacts by owner_id (PostgreSQL)
+
+Revision ID: a7c3e9f1b5d8
+Revises: f4a9c1d7b2e3
+Create Date: 2026-10-19 20:00:00.000000
+
+On PostgreSQL ``contacts`` is rebuilt as ``PARTITION BY HASH (owner_id)``
+with CONTACT_PARTITIONS partitions, online (copy-and-swap):
+
+1. ``contacts_new`` is created next to ``contacts`` with its partitions
+   and indexes, and a trigger on ``contacts`` mirrors every change into it;
+2. existing rows are copied in id ranges of CONTACT_PARTITION_COPY_BATCH,
+   each range in its own transaction; ``FOR SHARE`` makes concurrent
+   UPDATE/DELETE of a range wait for its copy, so the trigger always
+   applies them after it;
+3. a short ACCESS EXCLUSIVE transaction renames the tables, indexes and
+   constraints and hands the id sequence over to the new table.
+
+The old table stays as ``contacts_old`` for verification and has to be
+dropped by hand (``DROP TABLE contacts_old``). Downgrade runs the same
+procedure back into a plain table. Other databases are left untouched.
+Shards get the same layout, without the foreign key to ``users``.
+"""
+
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import settings
+from sharding import migrating_shard
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3e9f1b5d8"
+down_revision: Union[str, Sequence[str], None] = "f4a9c1d7b2e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+log = logging.getLogger("alembic.runtime.migration")
+
+COLUMNS = [
+    "id",
+    "first_name",
+    "last_name",
+    "email",
+    "phone",
+    "phone_normalized",
+    "date_of_birth",
+    "information",
+    "row_version",
+    "owner_id",
+]
+INDEXES = [
+    ("ix_contacts_id", ["id"], False),
+    ("ix_contacts_owner_name", ["owner_id", "last_name", "first_name"], False),
+    ("uq_contacts_owner_email", ["owner_id", "email"], True),
+    ("ix_contacts_owner_phone", ["owner_id", "phone_normalized"], False),
+    ("ix_contacts_owner_version", ["owner_id", "row_version"], False),
+]
+
+
+def _is_partitioned(bind) -> bool:
+    return bool(
+        bind.execute(
+            sa.text(
+                "SELECT relkind = 'p' FROM pg_class WHERE oid = 'contacts'::regclass"
+            )
+        ).scalar()
+    )
+
+
+def _create_target(sequence: str, partitions: int) -> None:
+    """contacts_new: секціонована (partitions > 0) або звичайна таблиця."""
+    # у секціонованої таблиці ключ секціонування входить у PRIMARY KEY
+    pk = ["id", "owner_id"] if partitions else ["id"]
+    # на шарді таблиці users немає
+    foreign_keys = (
+        []
+        if migrating_shard()
+        else [
+            sa.ForeignKeyConstraint(
+                ["owner_id"],
+                ["users.id"],
+                name="contacts_new_owner_id_fkey",
+                ondelete="CASCADE",
+            )
+        ]
+    )
+    op.create_table(
+        "contacts_new",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            nullable=False,
+            server_default=sa.text(f"nextval('{sequence}'::regclass)"),
+        ),
+        sa.Column("first_name", sa.String(length=100), nullable=False),
+        sa.Column("last_name", sa.String(length=100), nullable=False),
+        sa.Column("email", sa.String(length=200), nullable=False),
+        sa.Column("phone", sa.String(length=50), nullable=False),
+        sa.Column("phone_normalized", sa.String(length=16), nullable=True),
+        sa.Column("date_of_birth", sa.Date(), nullable=False),
+        sa.Column("information", sa.String(), nullable=True),
+        sa.Column("row_version", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        *foreign_keys,
+        sa.PrimaryKeyConstraint(*pk, name="contacts_new_pkey"),
+        postgresql_partition_by="HASH (owner_id)" if partitions else None,
+    )
+    for i in range(partitions):
+        op.execute(
+            f"CREATE TABLE contacts_new_p{i} PARTITION OF contacts_new "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})"
+        )
+    # індекси батьківської таблиці створюються й на кожній секції
+    for name, columns, unique in INDEXES:
+        op.create_index(f"{name}_new", "contacts_new", columns, unique=unique)
+
+
+def _mirror() -> None:
+    """Тригер на contacts повторює кожну зміну в contacts_new."""
+    cols = ", ".join(COLUMNS)
+    values = ", ".join(f"NEW.{c}" for c in COLUMNS)
+    op.execute(
+        f"""
+        CREATE FUNCTION contacts_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM contacts_new WHERE id = OLD.id AND owner_id = OLD.owner_id;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO contacts_new ({cols}) VALUES ({values});
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER contacts_mirror AFTER INSERT OR UPDATE OR DELETE ON contacts "
+        "FOR EACH ROW EXECUTE FUNCTION contacts_mirror()"
+    )
+
+
+def _copy(bind, batch: int) -> None:
+    """Наявні рядки пачками по id, кожна пачка — окрема транзакція."""
+    low, high = bind.execute(sa.text("SELECT min(id), max(id) FROM contacts")).one()
+    if low is None:
+        return
+    cols = ", ".join(COLUMNS)
+    # рядки, які тригер уже переніс, не чіпаємо: його версія новіша
+    copy = sa.text(
+        f"INSERT INTO contacts_new ({cols}) "
+        f"SELECT {cols} FROM contacts WHERE id >= :low AND id < :high "
+        "FOR SHARE ON CONFLICT DO NOTHING"
+    )
+    with op.get_context().autocommit_block():
+        for start in range(low, high + 1, batch):
+            bind.execute(copy, {"low": start, "high": start + batch})
+            log.info("contacts copy: id %s of %s", min(start + batch, high), high)
+
+
+def _swap(bind, sequence: str) -> None:
+    """Обмін таблиць: contacts -> contacts_old, contacts_new -> contacts."""
+    old_indexes = bind.execute(
+        sa.text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = 'contacts'::regclass AND NOT i.indisprimary"
+        )
+    ).scalars().all()
+    constraints = sa.text(
+        "SELECT conname FROM pg_constraint "
+        "WHERE conrelid = 'contacts'::regclass AND contype = :type"
+    )
+    old_pk = bind.execute(constraints, {"type": "p"}).scalar_one()
+    old_fks = bind.execute(constraints, {"type": "f"}).scalars().all()
+
+    # не чекати безкінечно за довгими транзакціями, тримаючи всіх у черзі
+    op.execute("SET LOCAL lock_timeout = '10s'")
+    op.execute("LOCK TABLE contacts, contacts_new IN ACCESS EXCLUSIVE MODE")
+    op.execute("DROP TRIGGER contacts_mirror ON contacts")
+    op.execute("DROP FUNCTION contacts_mirror()")
+
+    op.rename_table("contacts", "contacts_old")
+    op.execute(
+        f"ALTER TABLE contacts_old RENAME CONSTRAINT {old_pk} TO contacts_old_pkey"
+    )
+    for name in old_fks:
+        op.execute(f"ALTER TABLE contacts_old RENAME CONSTRAINT {name} TO {name}_old")
+    for name in old_indexes:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name}_old")
+
+    op.rename_table("contacts_new", "contacts")
+    op.execute(
+        "ALTER TABLE contacts RENAME CONSTRAINT contacts_new_pkey TO contacts_pkey"
+    )
+    if not migrating_shard():
+        op.execute(
+            "ALTER TABLE contacts RENAME CONSTRAINT contacts_new_owner_id_fkey "
+            "TO contacts_owner_id_fkey"
+        )
+    for name, _, _ in INDEXES:
+        op.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+    for (relname,) in bind.execute(
+        sa.text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'contacts'::regclass"
+        )
+    ).all():
+        op.execute(f"ALTER TABLE {relname} RENAME TO {relname.replace('_new_', '_')}")
+
+    # послідовність id переходить до нової таблиці разом із DEFAULT
+    op.execute("ALTER TABLE contacts_old ALTER COLUMN id DROP DEFAULT")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY contacts.id")
+
+
+def _rebuild(partitions: int) -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    if _is_partitioned(bind) == bool(partitions):
+        return
+    if sa.inspect(bind).has_table("contacts_old"):
+        raise RuntimeError(
+            "contacts_old from a previous rebuild still exists; "
+            "verify and drop it before running this migration"
+        )
+    sequence = bind.execute(
+        sa.text("SELECT pg_get_serial_sequence('contacts', 'id')")
+    ).scalar() or "contacts_id_seq"
+
+    # залишки перерваного запуску (contacts_new ще не була в роботі)
+    op.execute("DROP TRIGGER IF EXISTS contacts_mirror ON contacts")
+    op.execute("DROP FUNCTION IF EXISTS contacts_mirror()")
+    op.execute("DROP TABLE IF EXISTS contacts_new")
+    _create_target(sequence, partitions)
+    _mirror()
+    _copy(bind, settings.CONTACT_PARTITION_COPY_BATCH)
+    _swap(bind, sequence)
+    op.execute("ANALYZE contacts")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _rebuild(settings.CONTACT_PARTITIONS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _rebuild(0)
@@ -0,0 +1,97 @@
+"""Phonetic name keys for fuzzy contact search
+
+Revision ID: b3d8f2a6c914
+Revises: a7c3e9f1b5d8
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from services.phonetic import (
+    PHONETIC_MAX,
+    TRANSLIT_MAX,
+    phonetic_key,
+    translit_key,
+)
+from sharding import shard_has
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3d8f2a6c914"
+down_revision: Union[str, Sequence[str], None] = "a7c3e9f1b5d8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+COLUMNS = [
+    ("first_name_phonetic", PHONETIC_MAX),
+    ("last_name_phonetic", PHONETIC_MAX),
+    ("first_name_translit", TRANSLIT_MAX),
+    ("last_name_translit", TRANSLIT_MAX),
+]
+INDEXES = [
+    ("ix_contacts_owner_first_phonetic", "first_name_phonetic"),
+    ("ix_contacts_owner_last_phonetic", "last_name_phonetic"),
+    ("ix_contacts_owner_first_translit", "first_name_translit"),
+    ("ix_contacts_owner_last_translit", "last_name_translit"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # шард із create_shard_schemas може вже мати колонки й індекси
+    for name, length in COLUMNS:
+        if not shard_has("contacts", name):
+            op.add_column("contacts", sa.Column(name, sa.String(length=length)))
+
+    # backfill батчами за id
+    contacts = sa.table(
+        "contacts",
+        sa.column("id", sa.Integer),
+        sa.column("first_name", sa.String),
+        sa.column("last_name", sa.String),
+        *(sa.column(name, sa.String) for name, _ in COLUMNS),
+    )
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(contacts.c.id, contacts.c.first_name, contacts.c.last_name)
+            .where(contacts.c.id > last_id)
+            .order_by(contacts.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            contacts.update()
+            .where(contacts.c.id == sa.bindparam("_id"))
+            .values({name: sa.bindparam(f"_{name}") for name, _ in COLUMNS}),
+            [
+                {
+                    "_id": row.id,
+                    "_first_name_phonetic": phonetic_key(row.first_name),
+                    "_last_name_phonetic": phonetic_key(row.last_name),
+                    "_first_name_translit": translit_key(row.first_name),
+                    "_last_name_translit": translit_key(row.last_name),
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+    for index, column in INDEXES:
+        if not shard_has("contacts", index=index):
+            op.create_index(index, "contacts", ["owner_id", column], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for index, _ in INDEXES:
+        op.drop_index(index, table_name="contacts")
+    for name, _ in COLUMNS:
+        op.drop_column("contacts", name)
@@ -0,0 +1,75 @@
+"""Per-owner contact statistics
+
+Revision ID: c37f0b9e5a21
+Revises: 8a4c2e6f1d07
+Create Date: 2026-10-19 14:00:00.000000
+
+On a shard the table may already exist (``create_shard_schemas``); it is
+then refilled from ``contacts``.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sharding import shard_has
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c37f0b9e5a21"
+down_revision: Union[str, Sequence[str], None] = "8a4c2e6f1d07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = ["total", "missing_information", "missing_birthday"] + [
+    f"born_{m:02d}" for m in range(1, 13)
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    exists = shard_has("contact_stats")
+    if not exists:
+        op.create_table(
+            "contact_stats",
+            sa.Column("owner_id", sa.Integer(), nullable=False),
+            *(sa.Column(name, sa.Integer(), nullable=False) for name in COUNTERS),
+            sa.PrimaryKeyConstraint("owner_id"),
+        )
+    # початкове наповнення; далі — python -m services.contact_stats
+    contacts = sa.table(
+        "contacts",
+        sa.column("owner_id"),
+        sa.column("information"),
+        sa.column("date_of_birth"),
+    )
+    stats = sa.table("contact_stats", *(sa.column(c) for c in ["owner_id", *COUNTERS]))
+    month = sa.extract("month", contacts.c.date_of_birth)
+    if exists:
+        op.execute(stats.delete())
+
+    def count_if(condition):
+        return sa.func.sum(sa.case((condition, 1), else_=0))
+
+    op.execute(
+        stats.insert().from_select(
+            ["owner_id", *COUNTERS],
+            sa.select(
+                contacts.c.owner_id,
+                sa.func.count(),
+                count_if(
+                    sa.or_(
+                        contacts.c.information.is_(None), contacts.c.information == ""
+                    )
+                ),
+                count_if(contacts.c.date_of_birth.is_(None)),
+                *(count_if(month == m) for m in range(1, 13)),
+            ).group_by(contacts.c.owner_id),
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("contact_stats")
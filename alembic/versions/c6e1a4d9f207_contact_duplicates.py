@@ -0,0 +1,64 @@
+"""Duplicate contact pairs and per-owner dedup progress
+
+Revision ID: c6e1a4d9f207
+Revises: b3d8f2a6c914
+Create Date: 2026-10-19 22:00:00.000000
+
+On a shard the tables may already exist (``create_shard_schemas``).
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sharding import shard_has
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c6e1a4d9f207"
+down_revision: Union[str, Sequence[str], None] = "b3d8f2a6c914"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not shard_has("contact_duplicates"):
+        op.create_table(
+            "contact_duplicates",
+            sa.Column("owner_id", sa.Integer(), nullable=False),
+            sa.Column("contact_id", sa.Integer(), nullable=False),
+            sa.Column("duplicate_id", sa.Integer(), nullable=False),
+            sa.Column("score", sa.Float(), nullable=False),
+            sa.Column("reasons", sa.String(length=64), nullable=False),
+            sa.Column(
+                "detected_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.func.now(),
+            ),
+            sa.PrimaryKeyConstraint("owner_id", "contact_id", "duplicate_id"),
+        )
+        op.create_index(
+            "ix_contact_duplicates_owner_duplicate",
+            "contact_duplicates",
+            ["owner_id", "duplicate_id"],
+            unique=False,
+        )
+    if not shard_has("contact_dedup_state"):
+        op.create_table(
+            "contact_dedup_state",
+            sa.Column("owner_id", sa.Integer(), nullable=False),
+            sa.Column("version", sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint("owner_id"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("contact_dedup_state")
+    op.drop_index(
+        "ix_contact_duplicates_owner_duplicate", table_name="contact_duplicates"
+    )
+    op.drop_table("contact_duplicates")
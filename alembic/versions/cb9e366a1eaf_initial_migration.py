@@ -4,6 +4,16 @@ Revision ID: cb9e366a1eaf
 Revises:
 Create Date: 2025-11-03 17:41:45.652377
 
+Baseline: removes the pre-users ``contacts`` table (no ``owner_id``), which
+5d1e7a3c9b42 replaces. Nothing with data is dropped:
+
+- a legacy ``contacts`` table that still has rows stops the upgrade;
+- a schema the original application built itself with ``create_all``
+  (it has ``users``) was never stamped, so the upgrade stops and asks for
+  ``alembic stamp cb9e366a1eaf && alembic upgrade head``; 5d1e7a3c9b42
+  then keeps its tables and swaps the indexes.
+
+Shards never had the legacy table; there the revision is a no-op.
 """
 
 from typing import Sequence, Union
@@ -11,6 +21,8 @@ from typing import Sequence, Union
 from alembic import op
 import sqlalchemy as sa
 
+from sharding import migrating_shard
+
 
 # revision identifiers, used by Alembic.
 revision: str = "cb9e366a1eaf"
@@ -21,6 +33,25 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
+    if migrating_shard():
+        return
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    if "users" in tables:
+        raise RuntimeError(
+            "The schema was created by the application without Alembic and is "
+            "not stamped; nothing was changed. Run 'alembic stamp cb9e366a1eaf "
+            "&& alembic upgrade head' to migrate it in place."
+        )
+    # на чистій базі таблиці contacts ще немає
+    if "contacts" not in tables:
+        return
+    rows = bind.execute(sa.text("SELECT count(*) FROM contacts")).scalar()
+    if rows:
+        raise RuntimeError(
+            f"Legacy contacts table (without owner_id) still holds {rows} rows; "
+            "export or drop it by hand before migrating."
+        )
     # ### commands auto generated by Alembic - please adjust! ###
     op.drop_index(op.f("ix_contacts_email"), table_name="contacts")
     op.drop_index(op.f("ix_contacts_id"), table_name="contacts")
@@ -30,6 +61,8 @@ def upgrade() -> None:
 
 def downgrade() -> None:
     """Downgrade schema."""
+    if migrating_shard():
+        return
     # ### commands auto generated by Alembic - please adjust! ###
     op.create_table(
         "contacts",
@@ -0,0 +1,42 @@
+"""Claim digest_log rows before sending
+
+Revision ID: d4f7b2c8e935
+Revises: c6e1a4d9f207
+Create Date: 2026-10-20 10:00:00.000000
+
+``digest_log`` lives only in the primary database; shards skip this revision.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sharding import migrating_shard
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4f7b2c8e935"
+down_revision: Union[str, Sequence[str], None] = "c6e1a4d9f207"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if migrating_shard():
+        return
+    # наявні рядки писались після відправки — це "sent"
+    op.add_column(
+        "digest_log",
+        sa.Column(
+            "status", sa.String(length=16), nullable=False, server_default="sent"
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if migrating_shard():
+        return
+    op.drop_column("digest_log", "status")
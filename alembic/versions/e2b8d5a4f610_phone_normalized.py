@@ -0,0 +1,83 @@
+"""Normalized phone column with owner-scoped index
+
+Revision ID: e2b8d5a4f610
+Revises: c37f0b9e5a21
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import settings
+from services.phones import normalize_phone
+from sharding import shard_has
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e2b8d5a4f610"
+down_revision: Union[str, Sequence[str], None] = "c37f0b9e5a21"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # шард із create_shard_schemas може вже мати колонку й індекс
+    if not shard_has("contacts", "phone_normalized"):
+        op.add_column(
+            "contacts",
+            sa.Column("phone_normalized", sa.String(length=16), nullable=True),
+        )
+
+    # backfill батчами за id
+    contacts = sa.table(
+        "contacts",
+        sa.column("id", sa.Integer),
+        sa.column("phone", sa.String),
+        sa.column("phone_normalized", sa.String),
+    )
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(contacts.c.id, contacts.c.phone)
+            .where(contacts.c.id > last_id)
+            .order_by(contacts.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            contacts.update()
+            .where(contacts.c.id == sa.bindparam("_id"))
+            .values(phone_normalized=sa.bindparam("_phone")),
+            [
+                {
+                    "_id": row.id,
+                    "_phone": normalize_phone(
+                        row.phone, settings.DEFAULT_PHONE_COUNTRY_CODE
+                    ),
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+    if not shard_has("contacts", index="ix_contacts_owner_phone"):
+        op.create_index(
+            "ix_contacts_owner_phone",
+            "contacts",
+            ["owner_id", "phone_normalized"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_contacts_owner_phone", table_name="contacts")
+    op.drop_column("contacts", "phone_normalized")
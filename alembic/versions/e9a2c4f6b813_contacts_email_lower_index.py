@@ -0,0 +1,37 @@
+"""Owner-scoped index on lower(email) for duplicate detection
+
+Revision ID: e9a2c4f6b813
+Revises: d4f7b2c8e935
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sharding import shard_has
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e9a2c4f6b813"
+down_revision: Union[str, Sequence[str], None] = "d4f7b2c8e935"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not shard_has("contacts", index="ix_contacts_owner_email_lower"):
+        op.create_index(
+            "ix_contacts_owner_email_lower",
+            "contacts",
+            ["owner_id", sa.text("lower(email)")],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_contacts_owner_email_lower", table_name="contacts")
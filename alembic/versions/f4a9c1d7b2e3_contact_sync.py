@@ -0,0 +1,103 @@
+"""Row versions and tombstones for contact delta sync
+
+Revision ID: f4a9c1d7b2e3
+Revises: e2b8d5a4f610
+Create Date: 2026-10-19 18:00:00.000000
+
+On a shard whose ``contacts`` already has ``row_version`` (built by
+``create_shard_schemas``) the versions are kept; otherwise they are
+backfilled and the owners' counters rebuilt.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from sharding import shard_has
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f4a9c1d7b2e3"
+down_revision: Union[str, Sequence[str], None] = "e2b8d5a4f610"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _backfill_versions() -> None:
+    # існуючі рядки: версія = id (унікальна в межах власника),
+    # лічильник власника = найбільший id
+    contacts = sa.table(
+        "contacts",
+        sa.column("id", sa.Integer),
+        sa.column("owner_id", sa.Integer),
+        sa.column("row_version", sa.BigInteger),
+    )
+    state = sa.table(
+        "contact_sync_state",
+        sa.column("owner_id", sa.Integer),
+        sa.column("version", sa.BigInteger),
+        sa.column("floor", sa.BigInteger),
+    )
+    op.execute(contacts.update().values(row_version=contacts.c.id))
+    op.execute(state.delete())
+    op.execute(
+        state.insert().from_select(
+            ["owner_id", "version", "floor"],
+            sa.select(
+                contacts.c.owner_id, sa.func.max(contacts.c.id), sa.literal(0)
+            ).group_by(contacts.c.owner_id),
+        )
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    versioned = shard_has("contacts", "row_version")
+    if not versioned:
+        op.add_column(
+            "contacts",
+            sa.Column(
+                "row_version", sa.BigInteger(), nullable=False, server_default="0"
+            ),
+        )
+    if not shard_has("contact_sync_state"):
+        op.create_table(
+            "contact_sync_state",
+            sa.Column("owner_id", sa.Integer(), nullable=False),
+            sa.Column("version", sa.BigInteger(), nullable=False),
+            sa.Column("floor", sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint("owner_id"),
+        )
+    if not shard_has("contact_tombstones"):
+        op.create_table(
+            "contact_tombstones",
+            sa.Column("owner_id", sa.Integer(), nullable=False),
+            sa.Column("row_version", sa.BigInteger(), nullable=False),
+            sa.Column("contact_id", sa.Integer(), nullable=False),
+            sa.Column(
+                "deleted_at",
+                sa.DateTime(),
+                nullable=False,
+                server_default=sa.func.now(),
+            ),
+            sa.PrimaryKeyConstraint("owner_id", "row_version"),
+        )
+    if not versioned:
+        _backfill_versions()
+
+    if not shard_has("contacts", index="ix_contacts_owner_version"):
+        op.create_index(
+            "ix_contacts_owner_version",
+            "contacts",
+            ["owner_id", "row_version"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_contacts_owner_version", table_name="contacts")
+    op.drop_table("contact_tombstones")
+    op.drop_table("contact_sync_state")
+    op.drop_column("contacts", "row_version")
@@ -0,0 +1,90 @@
+"""Повні Contact-сутності проти проєкції LIST_COLUMNS на великому власнику.
+
+Наповнює окрему (тестову!) базу одним власником із N контактами, у яких
+information — кілька КБ тексту, і для кожного варіанта запиту друкує
+медіанний час і пік пам'яті (tracemalloc) на отримання результату.
+
+    python bench_projection.py sqlite+aiosqlite:////tmp/bench.db [100000]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import crud
+import models
+
+ROUNDS = 5
+INFORMATION = "Нотатка про контакт. " * 100  # ~2 КБ
+
+
+async def seed(engine, n: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+        await conn.execute(
+            insert(models.User),
+            [{"id": 1, "email": "bench@example.com", "hashed_password": "x"}],
+        )
+        batch = 10_000
+        for start in range(0, n, batch):
+            await conn.execute(
+                insert(models.Contact),
+                [
+                    {
+                        "first_name": f"First{c}",
+                        "last_name": f"Last{c % 1000}",
+                        "email": f"c{c}@example.com",
+                        "phone": f"+380{c:09d}",
+                        "date_of_birth": date(1970, 1, 1) + timedelta(days=c % 365),
+                        "information": INFORMATION,
+                        "owner_id": 1,
+                    }
+                    for c in range(start, min(start + batch, n))
+                ],
+            )
+
+
+async def measure(engine, fn) -> tuple[float, float]:
+    times, peaks = [], []
+    for _ in range(ROUNDS):
+        # нова сесія на кожен прогін — порожній identity map
+        async with AsyncSession(engine) as session:
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            result = await fn(session)
+            times.append(time.perf_counter() - t0)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            del result
+    return statistics.median(times), statistics.median(peaks)
+
+
+async def main(url: str, n: int) -> None:
+    engine = create_async_engine(url)
+    await seed(engine, n)
+    cases = [
+        ("list_contacts", lambda s: crud.list_contacts(s, 1)),
+        ("list_contact_rows", lambda s: crud.list_contact_rows(s, 1)),
+        ("search_contacts", lambda s: crud.search_contacts(s, "last1", 1)),
+        ("search_contact_rows", lambda s: crud.search_contact_rows(s, "last1", 1)),
+        ("upcoming_birthdays", lambda s: crud.upcoming_birthdays(s, 1)),
+        ("upcoming_birthday_rows", lambda s: crud.upcoming_birthday_rows(s, 1)),
+    ]
+    print(f"{n} contacts, median of {ROUNDS}")
+    for name, fn in cases:
+        seconds, peak = await measure(engine, fn)
+        print(f"{name:24} {seconds * 1000:9.1f} ms {peak / 2**20:9.1f} MiB")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        sys.exit(__doc__)
+    asyncio.run(main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) == 3 else 100_000))
@@ -0,0 +1,148 @@
+"""Накладні витрати Python на виклик гарячих запитів: select(), що
+будується на кожен виклик (як було), проти заздалегідь побудованих
+запитів crud.py з bindparam.
+
+Працює на SQLite у пам'яті з кількома рядками, тож час самої бази
+мізерний і однаковий для обох варіантів — різниця є накладними
+витратами на побудову запиту і пошук у кеші компіляції. Також друкує,
+скільки нових записів з'явилось у кеші компіляції за прогін.
+
+    python bench_statements.py [calls]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import crud
+import models
+from services.email import get_user_by_email
+
+
+# --- як було: запит будується на кожен виклик ---
+async def old_get_user_by_id(db, user_id):
+    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    return result.scalar_one_or_none()
+
+
+async def old_get_user_by_email(db, email):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+
+async def old_get_contact(db, contact_id):
+    Contact = models.Contact
+    result = await db.execute(select(Contact).where(Contact.id == contact_id))
+    return result.scalars().first()
+
+
+async def old_list_contacts(db, user_id, first_name=None, last_name=None, email=None):
+    Contact = models.Contact
+    q = select(Contact).where(Contact.owner_id == user_id)
+    conditions = []
+    if first_name:
+        conditions.append(Contact.first_name.ilike(f"%{first_name}%"))
+    if last_name:
+        conditions.append(Contact.last_name.ilike(f"%{last_name}%"))
+    if email:
+        conditions.append(Contact.email.ilike(f"%{email}%"))
+    if conditions:
+        q = q.where(or_(*conditions))
+    result = await db.execute(q.order_by(Contact.last_name, Contact.first_name))
+    return result.scalars().all()
+
+
+async def old_search_contacts(db, query, user_id):
+    Contact = models.Contact
+    like = f"%{query.lower()}%"
+    result = await db.execute(
+        select(Contact)
+        .where(Contact.owner_id == user_id)
+        .where(
+            or_(
+                Contact.first_name.ilike(like),
+                Contact.last_name.ilike(like),
+                Contact.email.ilike(like),
+            )
+        )
+    )
+    return result.scalars().all()
+
+
+CASES = [
+    ("get_user_by_id", old_get_user_by_id, crud.get_user_by_id, (1,)),
+    ("get_user_by_email", old_get_user_by_email, get_user_by_email, ("u1@example.com",)),
+    (
+        "get_contact",
+        old_get_contact,
+        lambda db, c: crud.get_contact(db, c, 1),
+        (1,),
+    ),
+    ("list_contacts", old_list_contacts, crud.list_contacts, (1,)),
+    (
+        "list_contacts(filters)",
+        lambda db, u: old_list_contacts(db, u, first_name="a", email="b"),
+        lambda db, u: crud.list_contacts(db, u, first_name="a", email="b"),
+        (1,),
+    ),
+    ("search_contacts", old_search_contacts, crud.search_contacts, ("nobody", 1)),
+]
+
+
+async def seed(engine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+        await conn.execute(
+            insert(models.User),
+            [{"id": 1, "email": "u1@example.com", "hashed_password": "x"}],
+        )
+        await conn.execute(
+            insert(models.Contact),
+            [
+                {
+                    "first_name": "Ann",
+                    "last_name": "Lee",
+                    "email": "ann@example.com",
+                    "phone": "+380000000001",
+                    "date_of_birth": date(1990, 1, 1),
+                    "owner_id": 1,
+                }
+            ],
+        )
+
+
+async def run(engine, fn, args, calls: int) -> float:
+    async with AsyncSession(engine) as db:
+        for _ in range(100):  # прогрів кешу компіляції
+            await fn(db, *args)
+        t0 = time.perf_counter()
+        for _ in range(calls):
+            await fn(db, *args)
+        return (time.perf_counter() - t0) / calls
+
+
+async def main(calls: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    await seed(engine)
+    cache = engine.sync_engine._compiled_cache
+    print(f"{'query':24} {'rebuilt':>10} {'prebuilt':>10} {'saved':>9}  new cache entries")
+    for name, old, new, args in CASES:
+        before = await run(engine, old, args, calls)
+        entries = len(cache)
+        after = await run(engine, new, args, calls)
+        warm = len(cache)
+        await run(engine, new, args, calls)
+        print(
+            f"{name:24} {before * 1e6:8.1f}µs {after * 1e6:8.1f}µs "
+            f"{(before - after) * 1e6:7.1f}µs  {len(cache) - warm}"
+            f" (first run {warm - entries})"
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
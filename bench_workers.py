@@ -0,0 +1,76 @@
+"""Пропускна здатність serve.py залежно від кількості воркерів.
+
+Для кожного значення WEB_CONCURRENCY піднімає сервер, ганяє конкурентні
+GET /login (рендер шаблону, без БД) і друкує запити/с.
+
+    python bench_workers.py 1 2 4
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+PORT = 8099
+DURATION = 5.0
+CONCURRENCY = 64
+
+
+async def _load(url: str) -> float:
+    done = 0
+    deadline = time.monotonic() + DURATION
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(limits=limits) as client:
+
+        async def user():
+            nonlocal done
+            while time.monotonic() < deadline:
+                r = await client.get(url)
+                r.raise_for_status()
+                done += 1
+
+        await asyncio.gather(*(user() for _ in range(CONCURRENCY)))
+    return done / DURATION
+
+
+def _wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def measure(workers: int) -> float:
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        PORT=str(PORT),
+        HOST="127.0.0.1",
+        BIRTHDAY_DIGEST_HOUR="-1",
+        GUNICORN_PIDFILE=f"/tmp/bench-gunicorn-{PORT}.pid",
+    )
+    server = subprocess.Popen([sys.executable, "serve.py"], env=env)
+    try:
+        url = f"http://127.0.0.1:{PORT}/login"
+        _wait_ready(url)
+        asyncio.run(_load(url))  # прогрів
+        return asyncio.run(_load(url))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [1, 2, 4]
+    results = {n: measure(n) for n in counts}
+    base = results[counts[0]]
+    for n, rps in results.items():
+        print(f"{n:>3} workers: {rps:8.0f} req/s  x{rps / base:.2f}")
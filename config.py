@@ -6,6 +6,16 @@ class Settings(BaseSettings):
     DATABASE_URL: str = Field(..., env="DATABASE_URL")
     REDIS_URL: str = Field(..., env="REDIS_URL")
 
+    # Репліки для read-only запитів, через кому (порожньо — все йде в primary)
+    DATABASE_REPLICA_URLS: str = Field("", env="DATABASE_REPLICA_URLS")
+    REPLICA_HEALTHCHECK_INTERVAL: int = Field(10, env="REPLICA_HEALTHCHECK_INTERVAL")
+    READ_YOUR_WRITES_SECONDS: int = Field(5, env="READ_YOUR_WRITES_SECONDS")
+
+    # Шарди для таблиці contacts: "name=url" через кому, імена сталі
+    # (порожньо — шардування вимкнене)
+    DATABASE_SHARD_URLS: str = Field("", env="DATABASE_SHARD_URLS")
+    SHARD_DIRECTORY_TTL: int = Field(5, env="SHARD_DIRECTORY_TTL")
+
     SECRET_KEY: str = Field(..., env="SECRET_KEY")
 
     REFRESH_SECRET_KEY: str = Field(..., env=" REFRESH_SECRET_KEY")
@@ -16,6 +26,12 @@ class Settings(BaseSettings):
 
     REFRESH_TOKEN_EXPIRE_DAYS: int = Field(..., env="REFRESH_TOKEN_EXPIRE_DAYS")
 
+    # Bloom-фільтр відкликаних refresh-токенів (services/revocation.py)
+    REVOCATION_BLOOM_CAPACITY: int = Field(100_000, env="REVOCATION_BLOOM_CAPACITY")
+    REVOCATION_SYNC_INTERVAL: int = Field(5, env="REVOCATION_SYNC_INTERVAL")
+    # скільки секунд без успішної синхронізації ще приймати токени за фільтром
+    REVOCATION_MAX_STALENESS: int = Field(60, env="REVOCATION_MAX_STALENESS")
+
     VERIFICATION_TOKEN_EXPIRE_HOURS: int = Field(
         ..., env=("VERIFICATION_TOKEN_EXPIRE_HOURS", 24)
     )
@@ -26,12 +42,89 @@ class Settings(BaseSettings):
     SMTP_PASS: str = Field(..., env="SMTP_PASS")
     SECRET_EMAIL: str = Field(..., env="SECRET_EMAIL")
 
+    # Щоденний дайджест днів народження (година запуску, -1 — вимкнено)
+    BIRTHDAY_DIGEST_HOUR: int = Field(8, env="BIRTHDAY_DIGEST_HOUR")
+    BIRTHDAY_DIGEST_DAYS: int = Field(7, env="BIRTHDAY_DIGEST_DAYS")
+    BIRTHDAY_DIGEST_CONCURRENCY: int = Field(10, env="BIRTHDAY_DIGEST_CONCURRENCY")
+
+    # Код країни для телефонів у національному форматі (services/phones.py)
+    DEFAULT_PHONE_COUNTRY_CODE: str = Field("380", env="DEFAULT_PHONE_COUNTRY_CODE")
+
+    # Автодоповнення: максимум ключів у префіксних індексах усіх власників
+    AUTOCOMPLETE_MAX_ENTRIES: int = Field(500_000, env="AUTOCOMPLETE_MAX_ENTRIES")
+
+    # Дельта-синхронізація: скільки днів зберігати tombstones (services/sync.py)
+    SYNC_TOMBSTONE_DAYS: int = Field(30, env="SYNC_TOMBSTONE_DAYS")
+
     CLOUDINARY_CLOUD_NAME: str = Field(..., env="CLOUDINARY_CLOUD_NAME")
     CLOUDINARY_API_KEY: str = Field(..., env="CLOUDINARY_API_KEY")
     CLOUDINARY_API_SECRET: str = Field(..., env="CLOUDINARY_API_SECRET")
 
     CORS_ORIGINS: str = Field(..., env="CORS_ORIGINS")
 
+    # serve.py (gunicorn + uvicorn workers); WEB_CONCURRENCY=0 — кількість CPU,
+    # обмежена DB_CONNECTION_BUDGET (з'єднань на базу з хоста, 0 — без обмеження)
+    HOST: str = Field("0.0.0.0", env="HOST")
+    PORT: int = Field(8011, env="PORT")
+    WEB_CONCURRENCY: int = Field(0, env="WEB_CONCURRENCY")
+    DB_CONNECTION_BUDGET: int = Field(0, env="DB_CONNECTION_BUDGET")
+    GRACEFUL_TIMEOUT: int = Field(30, env="GRACEFUL_TIMEOUT")
+    WORKER_MAX_REQUESTS: int = Field(10000, env="WORKER_MAX_REQUESTS")
+    WORKER_BOOT_WAIT: int = Field(5, env="WORKER_BOOT_WAIT")
+
+    # профілювання запитів (порожній токен і rate 0 — вимкнено)
+    PROFILING_TOKEN: str = Field("", env="PROFILING_TOKEN")
+    PROFILING_SAMPLE_RATE: float = Field(0.0, env="PROFILING_SAMPLE_RATE")
+    PROFILING_INTERVAL_MS: float = Field(1.0, env="PROFILING_INTERVAL_MS")
+    PROFILING_KEEP: int = Field(20, env="PROFILING_KEEP")
+
+    # GET /metrics лише з Authorization: Bearer <METRICS_TOKEN> (порожньо — вимкнено)
+    METRICS_TOKEN: str = Field("", env="METRICS_TOKEN")
+
+    # admission control; ADMISSION_CONCURRENCY=0 — ємність пулу primary
+    ADMISSION_ENABLED: bool = Field(True, env="ADMISSION_ENABLED")
+    ADMISSION_CONCURRENCY: int = Field(0, env="ADMISSION_CONCURRENCY")
+    ADMISSION_LIMITS: str = Field(
+        "read=1,write=0.8,bulk=0.3,background=0.2", env="ADMISSION_LIMITS"
+    )
+    ADMISSION_QUEUE_SIZE: int = Field(100, env="ADMISSION_QUEUE_SIZE")
+    ADMISSION_QUEUE_TIMEOUTS: str = Field(
+        "read=2,write=2,bulk=0.5,background=30", env="ADMISSION_QUEUE_TIMEOUTS"
+    )
+    ADMISSION_POOL_WAIT_MS: float = Field(200, env="ADMISSION_POOL_WAIT_MS")
+    # множники ADMISSION_POOL_WAIT_MS, з яких клас відкидається одразу
+    ADMISSION_POOL_WAIT_SHED: str = Field(
+        "bulk=1,background=1,write=2,read=4", env="ADMISSION_POOL_WAIT_SHED"
+    )
+    ADMISSION_RETRY_AFTER: int = Field(1, env="ADMISSION_RETRY_AFTER")
+
+    # трасування: memory,file,otlp (порожньо — вимкнено)
+    TRACING_EXPORTERS: str = Field("", env="TRACING_EXPORTERS")
+    TRACING_SAMPLE_RATE: float = Field(0.01, env="TRACING_SAMPLE_RATE")
+    # трейси з sampled у вхідному traceparent: максимум за секунду на воркер
+    TRACING_FORCED_PER_SECOND: float = Field(10, env="TRACING_FORCED_PER_SECOND")
+    TRACING_BUFFER: int = Field(5000, env="TRACING_BUFFER")
+    TRACING_FILE: str = Field("traces.jsonl", env="TRACING_FILE")
+    TRACING_OTLP_ENDPOINT: str = Field(
+        "http://localhost:4318/v1/traces", env="TRACING_OTLP_ENDPOINT"
+    )
+    TRACING_SERVICE_NAME: str = Field("contacts-api", env="TRACING_SERVICE_NAME")
+
+    # hash-секціонування contacts за owner_id (міграція a7c3e9f1b5d8, PostgreSQL)
+    CONTACT_PARTITIONS: int = Field(16, env="CONTACT_PARTITIONS")
+    CONTACT_PARTITION_COPY_BATCH: int = Field(10000, env="CONTACT_PARTITION_COPY_BATCH")
+
+    # вбудований режим (DATABASE_URL=sqlite+aiosqlite:///...)
+    SQLITE_SYNCHRONOUS: str = Field("NORMAL", env="SQLITE_SYNCHRONOUS")
+    SQLITE_CACHE_SIZE_KB: int = Field(65536, env="SQLITE_CACHE_SIZE_KB")
+    SQLITE_MMAP_SIZE: int = Field(268435456, env="SQLITE_MMAP_SIZE")
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(5000, env="SQLITE_BUSY_TIMEOUT_MS")
+    SQLITE_WRITER_TIMEOUT: float = Field(10, env="SQLITE_WRITER_TIMEOUT")
+
+    # пошук дублікатів (services/duplicates.py)
+    DUPLICATE_MIN_SCORE: float = Field(0.5, env="DUPLICATE_MIN_SCORE")
+    DUPLICATE_MAX_BUCKET: int = Field(50, env="DUPLICATE_MAX_BUCKET")
+
     class Config:
         env_file = ".env"
 
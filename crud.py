@@ -1,21 +1,37 @@
+import functools
+from collections import defaultdict
 from fastapi import HTTPException
-from sqlalchemy import select, or_, update, delete
+from sqlalchemy import bindparam, case, select, or_, update, delete, func
+from sqlalchemy.engine import Row
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, datetime, timedelta
+from config import settings
 from models import Contact, User
 from schemas import ContactCreate, ContactUpdate
+from services import duplicates
+from services.contact_stats import apply_delta, counters_delta
+from services.invalidation import invalidation_bus
+from services.phones import normalize_phone
+from services.phonetic import query_keys, score
+from services.sync import next_version, record_delete
+from services.tracing import traced
+from types import SimpleNamespace
 from typing import List, Optional
 
 
+@traced()
 async def create_contact(
     db: AsyncSession, contact: ContactCreate, owner_id: int
 ) -> Contact:
     contact_data = contact.dict()
     contact_data["owner_id"] = owner_id
     db_obj = Contact(**contact_data)
-    db.add(db_obj)
     try:
+        # версія до db.add, щоб autoflush не вставив рядок без неї
+        db_obj.row_version = await next_version(db, owner_id)
+        db.add(db_obj)
+        await apply_delta(db, owner_id, counters_delta(None, db_obj))
         await db.commit()
         await db.refresh(db_obj)
     except IntegrityError:
@@ -23,14 +39,121 @@ async def create_contact(
         raise HTTPException(
             status_code=400, detail="Contact with this email already exists."
         )
+    await _contacts_changed(owner_id)
     return db_obj
 
 
-async def get_contact(db: AsyncSession, contact_id: int) -> Optional[Contact]:
-    result = await db.execute(select(Contact).where(Contact.id == contact_id))
+async def _contacts_changed(owner_id: int) -> None:
+    # викликається після commit будь-якого запису в contacts власника
+    await invalidation_bus.publish("owner_contacts", owner_id)
+
+
+def _stats_snapshot(contact: Contact) -> SimpleNamespace:
+    # поля, від яких залежить contact_stats, до зміни контакту
+    return SimpleNamespace(
+        information=contact.information, date_of_birth=contact.date_of_birth
+    )
+
+
+@traced()
+async def get_contact(
+    db: AsyncSession, contact_id: int, owner_id: int
+) -> Optional[Contact]:
+    result = await db.execute(
+        _CONTACT_BY_ID, {"contact_id": contact_id, "user_id": owner_id}
+    )
     return result.scalars().first()
 
 
+# колонки для списків: information лише коротким фрагментом, без ORM-об'єктів
+INFORMATION_PREVIEW = 100
+LIST_COLUMNS = (
+    Contact.id,
+    Contact.first_name,
+    Contact.last_name,
+    Contact.email,
+    Contact.phone,
+    Contact.date_of_birth,
+    func.substr(Contact.information, 1, INFORMATION_PREVIEW).label("information"),
+)
+
+# --- заздалегідь побудовані запити гарячих шляхів ---
+# Будуються один раз; значення йдуть через bindparam, тож на виклик не
+# створюється новий select(), а ключ кешу компіляції SQLAlchemy
+# мемоізований на самому об'єкті запиту (гарантоване влучання в кеш).
+_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+_OWNER = Contact.owner_id == bindparam("user_id")
+# і за id — з власником: на секціонованій contacts це одна секція
+_CONTACT_BY_ID = select(Contact).where(_OWNER, Contact.id == bindparam("contact_id"))
+_SEARCH = or_(
+    Contact.first_name.ilike(bindparam("like")),
+    Contact.last_name.ilike(bindparam("like")),
+    Contact.email.ilike(bindparam("like")),
+)
+_SEARCH_CONTACTS = select(Contact).where(_OWNER).where(_SEARCH)
+_SEARCH_ROWS = select(*LIST_COLUMNS).where(_OWNER).where(_SEARCH)
+_OWNER_CONTACTS = select(Contact).where(_OWNER)
+_BIRTHDAY_ROWS = select(*LIST_COLUMNS).where(
+    _OWNER, Contact.date_of_birth.is_not(None)
+)
+_BY_PHONE = select(Contact).where(
+    _OWNER, Contact.phone_normalized == bindparam("phone")
+)
+_BY_PHONES = select(Contact).where(
+    _OWNER, Contact.phone_normalized.in_(bindparam("phones", expanding=True))
+)
+# нечіткий пошук: кандидати лише з індексів фонетичних ключів, не більше
+# FUZZY_CANDIDATES (однаково звучних імен у власника зазвичай кілька)
+FUZZY_CANDIDATES = 200
+_TRANSLIT_MATCH = or_(
+    Contact.first_name_translit.in_(bindparam("translit", expanding=True)),
+    Contact.last_name_translit.in_(bindparam("translit", expanding=True)),
+)
+_FUZZY_ROWS = (
+    select(*LIST_COLUMNS, Contact.first_name_translit, Contact.last_name_translit)
+    .where(
+        _OWNER,
+        or_(
+            Contact.first_name_phonetic.in_(bindparam("phonetic", expanding=True)),
+            Contact.last_name_phonetic.in_(bindparam("phonetic", expanding=True)),
+            _TRANSLIT_MATCH,
+        ),
+    )
+    # обрізання стабільне між запитами: спершу точні збіги транслітерації,
+    # далі в порядку списку
+    .order_by(
+        case((_TRANSLIT_MATCH, 0), else_=1),
+        Contact.last_name,
+        Contact.first_name,
+        Contact.id,
+    )
+    .limit(FUZZY_CANDIDATES)
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _list_statement(rows: bool, filters: tuple[str, ...]):
+    # по одному запиту на кожен набір фільтрів (не більше 2 * 8)
+    q = select(*LIST_COLUMNS) if rows else select(Contact)
+    q = q.where(_OWNER)
+    if filters:
+        q = q.where(or_(*(getattr(Contact, f).ilike(bindparam(f)) for f in filters)))
+    return q.order_by(Contact.last_name, Contact.first_name)
+
+
+def _list_query(rows: bool, user_id, first_name, last_name, email):
+    params = {"user_id": user_id}
+    for name, value in (
+        ("first_name", first_name),
+        ("last_name", last_name),
+        ("email", email),
+    ):
+        if value:
+            params[name] = f"%{value}%"
+    return _list_statement(rows, tuple(params)[1:]), params
+
+
+@traced()
 async def list_contacts(
     db: AsyncSession,
     user_id: int,
@@ -38,72 +161,168 @@ async def list_contacts(
     last_name: Optional[str] = None,
     email: Optional[str] = None,
 ) -> List[Contact]:
-    q = select(Contact).where(Contact.owner_id == user_id)
-
-    conditions = []
-    if first_name:
-        conditions.append(Contact.first_name.ilike(f"%{first_name}%"))
-    if last_name:
-        conditions.append(Contact.last_name.ilike(f"%{last_name}%"))
-    if email:
-        conditions.append(Contact.email.ilike(f"%{email}%"))
-    if conditions:
-        q = q.where(or_(*conditions))
-    result = await db.execute(q.order_by(Contact.last_name, Contact.first_name))
+    stmt, params = _list_query(False, user_id, first_name, last_name, email)
+    result = await db.execute(stmt, params)
     return result.scalars().all()
 
 
+@traced()
+async def list_contact_rows(
+    db: AsyncSession,
+    user_id: int,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    email: Optional[str] = None,
+) -> List[Row]:
+    """Як list_contacts, але лише LIST_COLUMNS — кортежі без identity map."""
+    stmt, params = _list_query(True, user_id, first_name, last_name, email)
+    result = await db.execute(stmt, params)
+    return result.all()
+
+
+@traced()
 async def update_contact(
-    db: AsyncSession, contact_id: int, contact: ContactUpdate
+    db: AsyncSession, contact_id: int, contact: ContactUpdate, owner_id: int
 ) -> Optional[Contact]:
-    stmt = select(Contact).where(Contact.id == contact_id)
-    res = await db.execute(stmt)
+    res = await db.execute(
+        _CONTACT_BY_ID, {"contact_id": contact_id, "user_id": owner_id}
+    )
     db_obj = res.scalars().first()
     if not db_obj:
         return None
+    before = _stats_snapshot(db_obj)
+    version = await next_version(db, db_obj.owner_id)
     for field, value in contact.dict(exclude_unset=True).items():
         setattr(db_obj, field, value)
+    db_obj.row_version = version
     db.add(db_obj)
+    await apply_delta(db, db_obj.owner_id, counters_delta(before, db_obj))
     await db.commit()
     await db.refresh(db_obj)
+    await _contacts_changed(db_obj.owner_id)
     return db_obj
 
 
-async def delete_contact(db: AsyncSession, contact_id: int) -> bool:
-    stmt = select(Contact).where(Contact.id == contact_id)
-    res = await db.execute(stmt)
+@traced()
+async def delete_contact(db: AsyncSession, contact_id: int, owner_id: int) -> bool:
+    res = await db.execute(
+        _CONTACT_BY_ID, {"contact_id": contact_id, "user_id": owner_id}
+    )
     db_obj = res.scalars().first()
     if not db_obj:
         return False
     await db.delete(db_obj)
+    await record_delete(db, db_obj)
+    await apply_delta(db, db_obj.owner_id, counters_delta(db_obj, None))
     await db.commit()
+    await _contacts_changed(db_obj.owner_id)
     return True
 
 
+@traced()
+async def merge_contacts(
+    db: AsyncSession, keep_id: int, merge_id: int, owner_id: int
+) -> Optional[Contact]:
+    """Зливає merge_id у keep_id однією транзакцією: information і відмінні
+    email/телефон переходять до keep_id, merge_id видаляється."""
+    params = {"user_id": owner_id}
+    res = await db.execute(_CONTACT_BY_ID, {**params, "contact_id": keep_id})
+    keep = res.scalars().first()
+    res = await db.execute(_CONTACT_BY_ID, {**params, "contact_id": merge_id})
+    other = res.scalars().first()
+    if not keep or not other:
+        return None
+    before = _stats_snapshot(keep)
+    version = await next_version(db, owner_id)
+    keep.information = duplicates.merged_information(keep, other)
+    keep.row_version = version
+    await apply_delta(db, owner_id, counters_delta(before, keep))
+    await db.delete(other)
+    await record_delete(db, other)
+    await apply_delta(db, owner_id, counters_delta(other, None))
+    await duplicates.forget(db, owner_id, [merge_id])
+    await db.commit()
+    await db.refresh(keep)
+    await _contacts_changed(owner_id)
+    return keep
+
+
+def _like(query: str) -> str:
+    return f"%{query.lower()}%"
+
+
+@traced()
 async def search_contacts(db: AsyncSession, query: str, user_id: int):
-    like = f"%{query.lower()}%"
     result = await db.execute(
-        select(Contact)
-        .where(Contact.owner_id == user_id)
-        .where(
-            or_(
-                Contact.first_name.ilike(like),
-                Contact.last_name.ilike(like),
-                Contact.email.ilike(like),
-            )
-        )
+        _SEARCH_CONTACTS, {"user_id": user_id, "like": _like(query)}
     )
     return result.scalars().all()
 
 
-async def upcoming_birthdays(
-    db: AsyncSession, user_id: int, days: int = 7
+@traced()
+async def search_contact_rows(db: AsyncSession, query: str, user_id: int) -> List[Row]:
+    result = await db.execute(_SEARCH_ROWS, {"user_id": user_id, "like": _like(query)})
+    return result.all()
+
+
+@traced()
+async def fuzzy_search_contact_rows(
+    db: AsyncSession, query: str, user_id: int
+) -> List[Row]:
+    """Пошук зі схожим написанням ("Olexandr" знаходить "Олександр"):
+    кандидати за фонетичними ключами, найближчі за відстанню редагування
+    — першими."""
+    phonetic, translit, words = query_keys(query)
+    if not words:
+        return []
+    result = await db.execute(
+        _FUZZY_ROWS, {"user_id": user_id, "phonetic": phonetic, "translit": translit}
+    )
+    rows = result.all()
+    rows.sort(
+        key=lambda r: (
+            score(words, r.first_name_translit, r.last_name_translit),
+            r.last_name,
+            r.first_name,
+            r.id,
+        )
+    )
+    return rows
+
+
+@traced()
+async def find_contacts_by_phone(
+    db: AsyncSession, user_id: int, phone: str
 ) -> List[Contact]:
+    """Чий це номер: один пошук по індексу (owner_id, phone_normalized)."""
+    normalized = normalize_phone(phone, settings.DEFAULT_PHONE_COUNTRY_CODE)
+    if not normalized:
+        return []
+    result = await db.execute(_BY_PHONE, {"user_id": user_id, "phone": normalized})
+    return result.scalars().all()
 
-    # Вибірка всіх контактів
-    result = await db.execute(select(Contact).where(Contact.owner_id == user_id))
-    contacts = result.scalars().all()
 
+@traced()
+async def find_contacts_by_phones(
+    db: AsyncSession, user_id: int, phones: List[str]
+) -> dict[str, List[Contact]]:
+    """Пакетний варіант: усі номери одним запитом з IN (...)."""
+    wanted = {
+        phone: normalize_phone(phone, settings.DEFAULT_PHONE_COUNTRY_CODE)
+        for phone in phones
+    }
+    keys = {n for n in wanted.values() if n}
+    found = defaultdict(list)
+    if keys:
+        result = await db.execute(
+            _BY_PHONES, {"user_id": user_id, "phones": sorted(keys)}
+        )
+        for contact in result.scalars():
+            found[contact.phone_normalized].append(contact)
+    return {phone: found.get(n, []) for phone, n in wanted.items()}
+
+
+def _upcoming(contacts, days: int) -> list:
     today = date.today()
     next_week = today + timedelta(days=days)
 
@@ -132,11 +351,31 @@ async def upcoming_birthdays(
     return [contact for _, contact in upcoming]
 
 
+@traced()
+async def upcoming_birthdays(
+    db: AsyncSession, user_id: int, days: int = 7
+) -> List[Contact]:
+
+    # Вибірка всіх контактів
+    result = await db.execute(_OWNER_CONTACTS, {"user_id": user_id})
+    return _upcoming(result.scalars().all(), days)
+
+
+@traced()
+async def upcoming_birthday_rows(
+    db: AsyncSession, user_id: int, days: int = 7
+) -> List[Row]:
+    result = await db.execute(_BIRTHDAY_ROWS, {"user_id": user_id})
+    return _upcoming(result.all(), days)
+
+
+@traced()
 async def get_user_by_id(db: AsyncSession, user_id: int):
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(_USER_BY_ID, {"user_id": user_id})
     return result.scalar_one_or_none()
 
 
+@traced()
 async def update_avatar(db: AsyncSession, current_user, avatar_url: str):
     """
     Обновлення аватару користувача в базе даних.
@@ -153,3 +392,4 @@ async def update_avatar(db: AsyncSession, current_user, avatar_url: str):
     )
     await db.execute(stmt)
     await db.commit()
+    await invalidation_bus.publish("user", current_user.id)
@@ -1,12 +1,281 @@
+import asyncio
+import itertools
+import time
+
+from fastapi import HTTPException, Request
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.util import await_only
 from config import settings
+from services import metrics, sqlite, tracing
+from services.admission import pool_wait
+from services.read_your_writes import read_your_writes
+from sharding import ShardRouter, parse_shard_urls
+
+
+class PrimarySession(Session):
+    """Sync-клас сесій primary-бази (до нього чіпляються event-хуки)."""
+
 
 engine = create_async_engine(settings.DATABASE_URL, echo=False, future=True)
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+sqlite.configure(engine)
+AsyncSessionLocal = sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=PrimarySession,
+    expire_on_commit=False,
+)
 Base = declarative_base()
 
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
+# --- read-your-writes (services/read_your_writes.py) ---
+@event.listens_for(PrimarySession, "after_flush")
+def _mark_flush_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _mark_statement_write(orm_execute_state):
+    # update()/delete() через db.execute() не проходять через flush
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _remember_writer(session):
+    user_id = session.info.get("user_id")
+    wrote = session.info.pop("wrote", False)
+    if wrote and user_id is not None and replicas.engines:
+        # до відповіді клієнту: наступне читання може прийти на інший воркер;
+        # хук синхронний, але виконується в greenlet AsyncSession
+        await_only(read_your_writes.mark(user_id))
+
+
+# --- shard read-only (власник саме переноситься на інший шард) ---
+def _reject_shard_write():
+    raise HTTPException(
+        status_code=503,
+        detail="Contacts are being migrated, try again shortly",
+        headers={"Retry-After": str(settings.SHARD_DIRECTORY_TTL)},
+    )
+
+
+@event.listens_for(PrimarySession, "before_flush")
+def _guard_shard_flush(session, flush_context, instances):
+    if session.info.get("shard_read_only") and any(
+        type(obj).__tablename__ == "contacts"
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        _reject_shard_write()
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _guard_shard_statement(orm_execute_state):
+    if (
+        orm_execute_state.session.info.get("shard_read_only")
+        and not orm_execute_state.is_select
+        and any(m.local_table.name == "contacts" for m in orm_execute_state.all_mappers)
+    ):
+        _reject_shard_write()
+
+
+# span на кожен SQL-запит (лише в семплованих запитах)
+@event.listens_for(Engine, "before_cursor_execute")
+def _trace_query_start(conn, cursor, statement, parameters, context, executemany):
+    context._trace_span = tracing.start_span(
+        "db.query", **{"db.system": conn.dialect.name, "db.statement": statement}
+    )
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _trace_query_end(conn, cursor, statement, parameters, context, executemany):
+    tracing.end_span(getattr(context, "_trace_span", None))
+
+
+@event.listens_for(Engine, "handle_error")
+def _trace_query_error(exception_context):
+    context = exception_context.execution_context
+    if context is not None:
+        tracing.end_span(
+            getattr(context, "_trace_span", None), exception_context.original_exception
+        )
+        context._trace_span = None
+
+
+# --- час утримання з'єднання ---
+# AsyncSession бере з'єднання з пулу ліниво, на першому запиті (after_begin),
+# і повертає його в кінці кореневої транзакції: commit/rollback/close.
+@event.listens_for(Session, "do_orm_execute")
+def _connection_requested(orm_execute_state):
+    # перший запит без транзакції піде по з'єднання в пул
+    session = orm_execute_state.session
+    if not session.in_transaction():
+        session.info["pool_wait_since"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_begin")
+def _connection_acquired(session, transaction, connection):
+    now = time.perf_counter()
+    session.info.setdefault("held_since", now)
+    requested = session.info.pop("pool_wait_since", None)
+    if requested is not None:
+        metrics.observe("db_pool_wait_seconds", now - requested)
+        pool_wait.record(now - requested)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _connection_released(session, transaction):
+    if transaction.parent is not None or "held_since" not in session.info:
+        return
+    held = time.perf_counter() - session.info.pop("held_since")
+    metrics.observe(
+        "db_connection_hold_seconds", held, route=session.info.get("route", "-")
+    )
+
+
+# --- SQLite: один письменник на воркер (services/sqlite.py) ---
+if engine.dialect.name == "sqlite":
+    sqlite.install_writer_queue(PrimarySession)
+
+
+async def release(session: AsyncSession) -> None:
+    """Повертає з'єднання в пул, коли робота з БД у хендлері завершена
+    (до рендерингу шаблону). Завантажені об'єкти лишаються доступними;
+    наступний запит через сесію знову візьме з'єднання."""
+    await session.close()
+
+
+# --- read replicas ---
+class ReplicaPool:
+    """Round-robin по здорових репліках з періодичною перевіркою SELECT 1."""
+
+    def __init__(self, urls: list[str], check_interval: float):
+        self.engines = [
+            create_async_engine(url, echo=False, future=True, pool_pre_ping=True)
+            for url in urls
+        ]
+        for e in self.engines:
+            sqlite.configure(e)
+        self.sessionmakers = [
+            sessionmaker(e, class_=AsyncSession, expire_on_commit=False)
+            for e in self.engines
+        ]
+        self.healthy = [True] * len(self.engines)
+        self.check_interval = check_interval
+        self._rr = itertools.count()
+        self._checked_at = 0.0
+        self._check_task: asyncio.Task | None = None
+
+    async def _ping(self, i: int) -> None:
+        try:
+            async with self.engines[i].connect() as conn:
+                await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout=2)
+            self.healthy[i] = True
+        except Exception:
+            self.healthy[i] = False
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*(self._ping(i) for i in range(len(self.engines))))
+
+    def _schedule_check(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        if self._check_task is not None and not self._check_task.done():
+            return
+        self._checked_at = now
+        self._check_task = asyncio.create_task(self.check_health())
+
+    def pick(self):
+        """Повертає sessionmaker наступної здорової репліки або None."""
+        if not self.engines:
+            return None
+        self._schedule_check()
+        for _ in range(len(self.engines)):
+            i = next(self._rr) % len(self.engines)
+            if self.healthy[i]:
+                return self.sessionmakers[i]
+        return None
+
+    async def dispose(self) -> None:
+        for e in self.engines:
+            await e.dispose()
+
+
+replicas = ReplicaPool(
+    [u.strip() for u in settings.DATABASE_REPLICA_URLS.split(",") if u.strip()],
+    check_interval=settings.REPLICA_HEALTHCHECK_INTERVAL,
+)
+
+
+shards = ShardRouter(
+    parse_shard_urls(settings.DATABASE_SHARD_URLS),
+    primary_engine=engine,
+    primary_url=settings.DATABASE_URL,
+    directory_ttl=settings.SHARD_DIRECTORY_TTL,
+)
+
+
+def dispose_after_fork() -> None:
+    """Викликається у воркері після fork: пули, успадковані від master,
+    відкидаються без закриття (їх з'єднання належать master)."""
+    engines = {engine, *replicas.engines, *shards.engines.values()}
+    for e in engines:
+        e.sync_engine.dispose(close=False)
+
+
+def _request_user_id(request: Request) -> int | None:
+    # виставляється в AuthMiddleware після перевірки JWT
+    return getattr(request.state, "user_id", None)
+
+
+def _route_name(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", request.url.path)
+
+
+async def _open_session(factory, request: Request) -> AsyncSession:
+    # contacts поточного користувача — на його шарді, users — у primary
+    user_id = _request_user_id(request)
+    binds, read_only = await shards.route(user_id)
+    session = factory(binds=binds) if binds else factory()
+    session.info["user_id"] = user_id
+    session.info["shard_read_only"] = read_only
+    session.info["route"] = _route_name(request)
+    session.info["factory"] = factory
+    session.info["binds"] = binds
+    return session
+
+
+def fork_session(session: AsyncSession) -> AsyncSession:
+    """Нова сесія з тими ж фабрикою (primary/репліка) і шардом, що й session."""
+    factory, binds = session.info["factory"], session.info["binds"]
+    forked = factory(binds=binds) if binds else factory()
+    for key in ("user_id", "shard_read_only", "route", "factory", "binds"):
+        forked.info[key] = session.info[key]
+    return forked
+
+
+async def get_db(request: Request):
+    with tracing.span("get_db"):
+        session = await _open_session(AsyncSessionLocal, request)
+    async with session:
+        yield session
+
+
+async def get_read_db(request: Request):
+    """Сесія для read-only залежностей: репліка, якщо є здорова і
+    користувач нещодавно нічого не записував, інакше primary."""
+    with tracing.span("get_read_db") as span:
+        user_id = _request_user_id(request)
+        factory = replicas.pick()
+        if factory is not None and await read_your_writes.recently_wrote(user_id):
+            factory = None
+        span.set("db.replica", factory is not None)
+        if factory is None:
+            factory = AsyncSessionLocal
+        session = await _open_session(factory, request)
+    async with session:
         yield session
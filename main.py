@@ -4,28 +4,40 @@ from fastapi import (
     BackgroundTasks,
     Form,
     Depends,
+    Header,
     Query,
     status,
     HTTPException,
 )
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
+from fastapi.responses import (
+    RedirectResponse,
+    JSONResponse,
+    HTMLResponse,
+    PlainTextResponse,
+)
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from jose import JWTError, jwt
-from database import get_db, engine
+from database import get_db, engine, release, shards
 from sqlalchemy.ext.asyncio import AsyncSession
 from config import settings
 from routers.contacts import router as contacts_router
 from routers.users import get_current_user, router as user_router
+from routers.admin import router as admin_router
 from services.auth import (
     verify_password,
     create_access_token,
     create_refresh_token,
+    decode_refresh_token,
     get_password_hash,
 )
+from services.revocation import revocation_list
+from services.birthday_digest import schedule_daily
+from services import metrics
+from services.invalidation import invalidation_bus
 from services.email import (
     get_user_by_email,
     send_verification_email,
@@ -34,6 +46,13 @@ from services.email import (
 )
 from middleware.auth import AuthMiddleware
 from middleware.rate_limit import limiter
+from middleware.profiling import ProfilingMiddleware
+from middleware.tracing import TracingMiddleware
+from middleware.admission import AdmissionMiddleware
+from services import admission, profiling, tracing
+from sharding import create_shard_schemas
+import asyncio
+import hmac
 import models, crud, schemas
 
 templates = Jinja2Templates(directory="templates")
@@ -55,11 +74,20 @@ app.add_middleware(AuthMiddleware)
 app.state.limiter = limiter
 app.add_middleware(SlowAPIMiddleware)
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# admission control: черга з дедлайнами перед пулом з'єднань
+if admission.enabled():
+    app.add_middleware(AdmissionMiddleware)
+# профілювання на вимогу — зовнішній шар, щоб бачити і час middleware
+if profiling.enabled():
+    app.add_middleware(ProfilingMiddleware)
+if tracing.enabled():
+    app.add_middleware(TracingMiddleware)
 
 # Include routers
 app.include_router(contacts_router)
 app.include_router(user_router)
 app.include_router(email_router)
+app.include_router(admin_router)
 
 
 # створити таблиці при старті (замість повноцінних міграцій)
@@ -67,6 +95,12 @@ app.include_router(email_router)
 async def on_startup():
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+    await shards.check_pins()
+    await create_shard_schemas(shards)
+    if settings.BIRTHDAY_DIGEST_HOUR >= 0:
+        app.state.birthday_digest = asyncio.create_task(schedule_daily())
+    # кожен воркер слухає інвалідації кешів від інших
+    app.state.invalidation = asyncio.create_task(invalidation_bus.run())
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -161,6 +195,7 @@ async def login_submit(
     db: AsyncSession = Depends(get_db),
 ):
     user = await get_user_by_email(db, email)
+    await release(db)  # bcrypt повільний — не тримаємо з'єднання
     if not user or not verify_password(password, user.hashed_password):
         return templates.TemplateResponse(
             "login.html",
@@ -194,7 +229,17 @@ async def login_submit(
 
 
 @app.post("/logout")
-async def logout():
+async def logout(request: Request):
+    # відкликаємо refresh-токен, щоб його не можна було використати повторно
+    refresh_token = request.cookies.get("refresh_token")
+    if refresh_token:
+        try:
+            payload = decode_refresh_token(refresh_token)
+            if payload.get("jti"):
+                await revocation_list.revoke(payload["jti"], payload["exp"])
+        except Exception:
+            pass  # невалідний токен або Redis недоступний — просто чистимо cookie
+
     resp = RedirectResponse("/login", status_code=303)
     resp.delete_cookie("access_token")
     resp.delete_cookie("refresh_token")
@@ -208,7 +253,12 @@ async def logout():
 
 
 @app.get("/profile")
-async def profile(request: Request, current_user=Depends(get_current_user)):
+async def profile(
+    request: Request,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await release(db)
     return templates.TemplateResponse(
         "profile.html", {"request": request, "user": current_user}
     )
@@ -221,6 +271,7 @@ async def login_token(
     db: AsyncSession = Depends(get_db),
 ):
     user = await get_user_by_email(db, email)
+    await release(db)  # bcrypt повільний — не тримаємо з'єднання
     if not user or not verify_password(password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
@@ -237,6 +288,24 @@ async def login_token(
     return response
 
 
+def require_metrics_token(authorization: str | None = Header(None)):
+    # як /admin: без токена ендпоінта ніби немає
+    token = settings.METRICS_TOKEN
+    if not token or not authorization or not hmac.compare_digest(
+        authorization.encode(), f"Bearer {token}".encode()
+    ):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_metrics_token)],
+)
+async def metrics_endpoint():
+    return metrics.render()
+
+
 # Обробник помилки rate limit тільки для цього роутера
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request, exc):
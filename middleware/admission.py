@@ -0,0 +1,114 @@
+import json
+
+from jose import JWTError
+from starlette.requests import cookie_parser
+
+from config import settings
+from services import admission
+from services.auth import decode_access_token, decode_refresh_token
+
+# сторінки без звернень до БД — не обмежуються
+EXEMPT_PREFIXES = ("/metrics", "/admin")
+PAGES = {"/", "/login", "/register"}
+BULK_PREFIXES = (
+    "/contacts/lookup/phones",
+    "/contacts/sync",
+    "/contacts/duplicates",
+    "/users/avatar",
+)
+
+
+def _tokens(scope) -> tuple[str | None, str | None]:
+    """(access, refresh) із заголовка Authorization і cookie, не перевірені."""
+    access = refresh = None
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                access = token.strip()
+        elif name == b"cookie":
+            cookies = cookie_parser(value.decode("latin-1"))
+            access = access or cookies.get("access_token")
+            refresh = cookies.get("refresh_token")
+    return access, refresh
+
+
+def _authenticated(scope) -> bool:
+    """Підпис і строк дії токена перевірені: довільна cookie не дає класу read.
+
+    Відкликання refresh-токена далі перевіряє AuthMiddleware.
+    """
+    access, refresh = _tokens(scope)
+    if access:
+        try:
+            decode_access_token(access.removeprefix("Bearer ").strip())
+            return True
+        except JWTError:
+            pass
+    if refresh:
+        try:
+            decode_refresh_token(refresh)
+            return True
+        except JWTError:
+            pass
+    return False
+
+
+def _matches(path: str, prefixes) -> bool:
+    return any(path == p or path.startswith(p + "/") for p in prefixes)
+
+
+def route_class(scope) -> str | None:
+    """Клас маршруту для admission control або None, якщо не обмежується."""
+    path = scope["path"].rstrip("/") or "/"
+    method = scope["method"]
+    is_get = method in ("GET", "HEAD")
+    if _matches(path, EXEMPT_PREFIXES) or (is_get and path in PAGES):
+        return None
+    if _matches(path, BULK_PREFIXES):
+        return "bulk"
+    if is_get and not path.startswith("/contacts/delete/") and _authenticated(scope):
+        return "read"
+    return "write"
+
+
+class AdmissionMiddleware:
+    """ASGI-обгортка над services.admission: слот на час обробки запиту,
+    швидкий 503 + Retry-After замість очікування на пул з'єднань."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        cls = route_class(scope)
+        if cls is None:
+            return await self.app(scope, receive, send)
+
+        controller = admission.controller()
+        try:
+            await controller.acquire(cls)
+        except admission.Rejected as exc:
+            return await self._reject(send, exc.reason)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(cls)
+
+    async def _reject(self, send, reason: str) -> None:
+        body = json.dumps(
+            {"detail": "Server is busy, try again shortly", "reason": reason}
+        ).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(settings.ADMISSION_RETRY_AFTER).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
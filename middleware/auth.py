@@ -4,15 +4,21 @@ from jose import JWTError, jwt
 from config import settings
 from starlette.middleware.base import BaseHTTPMiddleware
 from services.auth import create_access_token
+from services.revocation import revocation_list
+from services import tracing
 
 
 class AuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request, call_next):
+        with tracing.span("AuthMiddleware"):
+            return await self._dispatch(request, call_next)
+
+    async def _dispatch(self, request, call_next):
         # path = request.url.path
         path = request.url.path.rstrip("/")
 
-        # Маршрути без захисту
-        public_paths = ["/", "/login", "/register", "/auth/token"]
+        # Маршрути без захисту (/metrics і /admin мають власні токени)
+        public_paths = ["/", "/login", "/register", "/auth/token", "/metrics", "/admin"]
 
         if any(path == pub or path.startswith(pub + "/") for pub in public_paths):
             return await call_next(request)
@@ -28,9 +34,13 @@ class AuthMiddleware(BaseHTTPMiddleware):
         # Перевірка access token
         if access_token:
             try:
-                jwt.decode(
-                    access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-                )
+                with tracing.span("jwt.decode"):
+                    payload = jwt.decode(
+                        access_token,
+                        settings.SECRET_KEY,
+                        algorithms=[settings.ALGORITHM],
+                    )
+                request.state.user_id = int(payload.get("sub"))
                 return await call_next(request)
             except:
                 pass
@@ -38,13 +48,17 @@ class AuthMiddleware(BaseHTTPMiddleware):
         # Перевірка refresh token
         if refresh_token:
             try:
-                payload = jwt.decode(
-                    refresh_token,
-                    settings.REFRESH_SECRET_KEY,
-                    algorithms=[settings.ALGORITHM],
-                )
+                with tracing.span("jwt.decode", token="refresh"):
+                    payload = jwt.decode(
+                        refresh_token,
+                        settings.REFRESH_SECRET_KEY,
+                        algorithms=[settings.ALGORITHM],
+                    )
+                if await revocation_list.is_revoked(payload.get("jti")):
+                    return RedirectResponse("/login", status_code=303)
                 user_id = payload.get("sub")
                 new_access = create_access_token(user_id)
+                request.state.user_id = int(user_id)
                 response = await call_next(request)
                 response.set_cookie(
                     "access_token", new_access, httponly=True, samesite="lax"
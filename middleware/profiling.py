@@ -0,0 +1,62 @@
+import random
+import threading
+import time
+
+from config import settings
+from services.profiling import Profile, StackSampler, profile_store
+
+
+class ProfilingMiddleware:
+    """ASGI-обгортка: профілює запит із заголовком X-Profile: <PROFILING_TOKEN>
+    або випадковий запит з імовірністю PROFILING_SAMPLE_RATE.
+
+    Додається в main.py лише коли профілювання увімкнене, тож вимкнений хук
+    не коштує нічого.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.token = settings.PROFILING_TOKEN.encode()
+        self.rate = settings.PROFILING_SAMPLE_RATE
+        self.interval = settings.PROFILING_INTERVAL_MS / 1000
+
+    def _wanted(self, scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return value == self.token
+        return self.rate > 0 and random.random() < self.rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+        if not profile_store.try_begin():
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        started = time.time()
+        t0 = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            samples = sampler.stop()
+            profile_store.end(
+                Profile(
+                    scope["method"],
+                    scope["path"],
+                    status,
+                    started,
+                    time.perf_counter() - t0,
+                    self.interval,
+                    samples,
+                )
+            )
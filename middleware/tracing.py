@@ -0,0 +1,38 @@
+from services import tracing
+
+
+class TracingMiddleware:
+    """ASGI-обгортка: кореневий span на запит і traceparent у відповіді.
+
+    Додається в main.py лише коли задано TRACING_EXPORTERS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        root = tracing.start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent,
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        if root is None:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set("http.status_code", message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"traceparent", root.traceparent().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with tracing.activate(root):
+            await self.app(scope, receive, send_wrapper)
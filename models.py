@@ -1,24 +1,172 @@
-from sqlalchemy import Column, Integer, String, Date, Text, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    Integer,
+    String,
+    Date,
+    Text,
+    Boolean,
+    ForeignKey,
+    Index,
+    PrimaryKeyConstraint,
+    func,
+)
+from sqlalchemy.orm import relationship, validates
+from config import settings
 from database import Base
+from services.phones import normalize_phone
+from services.phonetic import (
+    PHONETIC_MAX,
+    TRANSLIT_MAX,
+    phonetic_key,
+    translit_key,
+)
 
 
 class Contact(Base):
     __tablename__ = "contacts"
+    # усі запити до контактів обмежені owner_id; на PostgreSQL таблиця
+    # секціонована HASH (owner_id) з PRIMARY KEY (id, owner_id) (міграція
+    # a7c3e9f1b5d8), тож ORM-ідентичність теж (id, owner_id): UPDATE, DELETE
+    # і refresh звертаються до однієї секції, а не до всіх
+    __table_args__ = (
+        Index("ix_contacts_owner_name", "owner_id", "last_name", "first_name"),
+        Index("uq_contacts_owner_email", "owner_id", "email", unique=True),
+        Index("ix_contacts_owner_phone", "owner_id", "phone_normalized"),
+        Index("ix_contacts_owner_version", "owner_id", "row_version"),
+        Index("ix_contacts_owner_first_phonetic", "owner_id", "first_name_phonetic"),
+        Index("ix_contacts_owner_last_phonetic", "owner_id", "last_name_phonetic"),
+        Index("ix_contacts_owner_first_translit", "owner_id", "first_name_translit"),
+        Index("ix_contacts_owner_last_translit", "owner_id", "last_name_translit"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(100), nullable=False)
     last_name = Column(String(100), nullable=False)
-    email = Column(String(200), unique=True, index=True, nullable=False)
+    email = Column(String(200), nullable=False)
     phone = Column(String(50), nullable=False)
+    phone_normalized = Column(String(16), nullable=True)  # цифри E.164
     date_of_birth = Column(Date, nullable=False)
     information = Column(String, nullable=True)
+    # версія останньої зміни в межах власника (services/sync.py)
+    row_version = Column(BigInteger, nullable=False, default=0)
+    # ключі нечіткого пошуку (services/phonetic.py)
+    first_name_phonetic = Column(String(PHONETIC_MAX), nullable=True)
+    last_name_phonetic = Column(String(PHONETIC_MAX), nullable=True)
+    first_name_translit = Column(String(TRANSLIT_MAX), nullable=True)
+    last_name_translit = Column(String(TRANSLIT_MAX), nullable=True)
 
     owner_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     owner = relationship("User", back_populates="contacts")
 
+    __mapper_args__ = {"primary_key": [id, owner_id]}
+
+    @validates("phone")
+    def _normalize_phone(self, key, value):
+        self.phone_normalized = normalize_phone(
+            value, settings.DEFAULT_PHONE_COUNTRY_CODE
+        )
+        return value
+
+    @validates("first_name", "last_name")
+    def _name_keys(self, key, value):
+        setattr(self, f"{key}_phonetic", phonetic_key(value))
+        setattr(self, f"{key}_translit", translit_key(value))
+        return value
+
+
+# сусіди по email-кошику при пошуку дублікатів (services/duplicates.py)
+Index("ix_contacts_owner_email_lower", Contact.owner_id, func.lower(Contact.email))
+
+
+class ContactStats(Base):
+    """Лічильники контактів власника, оновлюються в тій самій транзакції,
+    що й contacts (services/contact_stats.py)."""
+
+    __tablename__ = "contact_stats"
+
+    owner_id = Column(Integer, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    missing_information = Column(Integer, nullable=False, default=0)
+    missing_birthday = Column(Integer, nullable=False, default=0)
+    born_01 = Column(Integer, nullable=False, default=0)
+    born_02 = Column(Integer, nullable=False, default=0)
+    born_03 = Column(Integer, nullable=False, default=0)
+    born_04 = Column(Integer, nullable=False, default=0)
+    born_05 = Column(Integer, nullable=False, default=0)
+    born_06 = Column(Integer, nullable=False, default=0)
+    born_07 = Column(Integer, nullable=False, default=0)
+    born_08 = Column(Integer, nullable=False, default=0)
+    born_09 = Column(Integer, nullable=False, default=0)
+    born_10 = Column(Integer, nullable=False, default=0)
+    born_11 = Column(Integer, nullable=False, default=0)
+    born_12 = Column(Integer, nullable=False, default=0)
+
+
+class ContactSyncState(Base):
+    """Лічильник версій контактів власника для дельта-синхронізації."""
+
+    __tablename__ = "contact_sync_state"
+
+    owner_id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    # курсори, менші за floor, недійсні — клієнт синхронізується з нуля
+    floor = Column(BigInteger, nullable=False, default=0)
+
+
+class ContactTombstone(Base):
+    """Видалені контакти: клієнти дізнаються про них через /contacts/sync."""
+
+    __tablename__ = "contact_tombstones"
+    __table_args__ = (PrimaryKeyConstraint("owner_id", "row_version"),)
+
+    owner_id = Column(Integer, nullable=False)
+    row_version = Column(BigInteger, nullable=False)
+    contact_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class ContactDuplicate(Base):
+    """Ймовірні дублікати: пара контактів власника (contact_id < duplicate_id)
+    з оцінкою схожості (services/duplicates.py)."""
+
+    __tablename__ = "contact_duplicates"
+    __table_args__ = (
+        PrimaryKeyConstraint("owner_id", "contact_id", "duplicate_id"),
+        Index("ix_contact_duplicates_owner_duplicate", "owner_id", "duplicate_id"),
+    )
+
+    owner_id = Column(Integer, nullable=False)
+    contact_id = Column(Integer, nullable=False)
+    duplicate_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    reasons = Column(String(64), nullable=False)  # "email,phone,name,birthday"
+    detected_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class ContactDedupState(Base):
+    """До якої версії (contact_sync_state.version) контакти власника вже
+    перевірені на дублікати."""
+
+    __tablename__ = "contact_dedup_state"
+
+    owner_id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+# таблиці, що живуть на шарді власника разом із contacts (sharding.py)
+SHARDED_MODELS = (
+    ContactStats,
+    ContactSyncState,
+    ContactTombstone,
+    ContactDuplicate,
+    ContactDedupState,
+)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -37,3 +185,44 @@ class User(Base):
     contacts = relationship(
         "Contact", back_populates="owner", cascade="all, delete-orphan"
     )
+
+
+class OwnerShard(Base):
+    """Явне закріплення власника за шардом (див. sharding.py)."""
+
+    __tablename__ = "owner_shards"
+
+    owner_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    shard = Column(String(32), nullable=False)
+    read_only = Column(Boolean, default=False, nullable=False)
+
+
+class DigestCheckpoint(Base):
+    """Прогрес щоденної розсилки днів народження по шарду.
+
+    Усі власники з owner_id <= last_owner_id уже оброблені.
+    """
+
+    __tablename__ = "digest_checkpoints"
+    __table_args__ = (PrimaryKeyConstraint("run_date", "shard"),)
+
+    run_date = Column(Date, nullable=False)
+    shard = Column(String(32), nullable=False)
+    last_owner_id = Column(Integer, nullable=False, default=0)
+
+
+class DigestLog(Base):
+    """Власники, яким дайджест за run_date надіслано або саме надсилається.
+
+    Рядок (status="claimed") комітиться до відправки листа, тож повторний
+    запуск пропускає власника навіть після падіння посеред відправки.
+    """
+
+    __tablename__ = "digest_log"
+    __table_args__ = (PrimaryKeyConstraint("run_date", "owner_id"),)
+
+    run_date = Column(Date, nullable=False)
+    owner_id = Column(Integer, nullable=False)
+    status = Column(String(16), nullable=False, default="sent", server_default="sent")
@@ -0,0 +1,43 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import HTMLResponse, PlainTextResponse
+
+from config import settings
+from services.profiling import profile_store
+from services.tracing import memory_exporter
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def require_admin(x_profile: str | None = Header(None)):
+    # той самий токен, що вмикає профілювання запиту
+    token = settings.PROFILING_TOKEN
+    if not token or not x_profile or not hmac.compare_digest(x_profile, token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Останні профілі цього воркера, найновіші першими."""
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(
+    profile_id: int, format: str = Query("collapsed", pattern="^(collapsed|html)$")
+):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "html":
+        return HTMLResponse(profile.html())
+    return PlainTextResponse(profile.collapsed())
+
+
+@router.get("/traces", dependencies=[Depends(require_admin)])
+async def recent_traces(limit: int = Query(20, ge=1, le=200)):
+    """Останні трейси з кільцевого буфера (експортер memory)."""
+    if memory_exporter is None:
+        raise HTTPException(status_code=404, detail="Memory exporter is disabled")
+    return memory_exporter.traces(limit)
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Query, Depends, HTTPException, status, Request, Form
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db
+from database import get_db, get_read_db, release
 from services.deps import get_dep_current_user
-from routers.users import get_current_user
+from routers.users import get_current_user, get_current_read_user
 from schemas import ContactCreate
 from typing import List
 from fastapi.templating import Jinja2Templates
@@ -11,6 +11,11 @@ from models import Contact, User
 from fastapi.responses import RedirectResponse
 from config import settings
 from datetime import datetime
+from services.autocomplete import autocomplete_cache
+from services import duplicates
+from services.contact_stats import get_stats
+from services.sync import changes_since
+from services.singleflight import coalesce
 import schemas, crud, models
 
 templates = Jinja2Templates(directory="templates")
@@ -18,13 +23,22 @@ templates = Jinja2Templates(directory="templates")
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
 
+def current_user_id(request: Request) -> int:
+    # user_id вже перевірений AuthMiddleware — без запиту користувача до БД
+    user_id = getattr(request.state, "user_id", None)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user_id
+
+
 # 🏠 Головна сторінка зі списком контактів
 @router.get("/")
 async def read_contacts(
     request: Request,
     q: str | None = Query(None, description="Пошук за іменем, прізвищем або email"),
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    fuzzy: bool = Query(False, description="Схоже написання імені чи прізвища"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_read_user),
 ):
     # Отримуємо JWT з cookies
     token = request.cookies.get("access_token")
@@ -47,11 +61,17 @@ async def read_contacts(
     if not user:
         return RedirectResponse(url="/login", status_code=303)
 
+    # з'єднання сесії запиту більше не потрібне: список читається спільним
+    # (single-flight) викликом у власній сесії
+    await release(db)
+
     # Шукаємо контакти, які належать саме цьому користувачу
-    if q:
-        contacts = await crud.search_contacts(db, q, user.id)
+    if q and fuzzy:
+        contacts = await coalesce(db, crud.fuzzy_search_contact_rows, q, user.id)
+    elif q:
+        contacts = await coalesce(db, crud.search_contact_rows, q, user.id)
     else:
-        contacts = await crud.list_contacts(db, user_id=user.id)
+        contacts = await coalesce(db, crud.list_contact_rows, user_id=user.id)
 
     # Повертаємо шаблон зі списком контактів
     return templates.TemplateResponse(
@@ -61,6 +81,7 @@ async def read_contacts(
             "user": current_user,
             "contacts": contacts,
             "query": q or "",
+            "fuzzy": fuzzy,
         },
     )
 
@@ -103,9 +124,13 @@ async def create_contact(
 # ✏️ Форма редагування
 @router.get("/edit/{contact_id}")
 async def edit_contact_form(
-    request: Request, contact_id: int, db: AsyncSession = Depends(get_db)
+    request: Request,
+    contact_id: int,
+    user_id: int = Depends(current_user_id),
+    db: AsyncSession = Depends(get_db),
 ):
-    contact = await crud.get_contact(db, contact_id)
+    contact = await crud.get_contact(db, contact_id, user_id)
+    await release(db)
     if not contact:
         return RedirectResponse("/contacts", status_code=303)
     return templates.TemplateResponse(
@@ -122,6 +147,7 @@ async def update_contact(
     phone: str = Form(...),
     date_of_birth: str = Form(...),
     information: str = Form(None),
+    user_id: int = Depends(current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     dob = None
@@ -136,7 +162,7 @@ async def update_contact(
         date_of_birth=dob,
         information=information,
     )
-    await crud.update_contact(db, contact_id, data)
+    await crud.update_contact(db, contact_id, data, user_id)
     return RedirectResponse("/contacts", status_code=303)
 
 
@@ -144,17 +170,104 @@ async def update_contact(
 @router.get("/birthdays/upcoming")
 async def birthdays_page(
     request: Request,
-    current_user=Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_read_user),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    contacts = await crud.upcoming_birthdays(db, user_id=current_user.id)
+    await release(db)
+    contacts = await coalesce(
+        db, crud.upcoming_birthday_rows, user_id=current_user.id
+    )
     return templates.TemplateResponse(
         "birthdays.html", {"request": request, "contacts": contacts}
     )
 
 
+# 📊 API: Статистика контактів (один запит за ключем, незалежно від кількості)
+@router.get("/stats")
+async def contact_stats(
+    current_user=Depends(get_current_read_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await get_stats(db, current_user.id)
+
+
+# 🔎 API: Автодоповнення для поля пошуку
+# індекс будується з primary: побудова з репліки, що відстає, кешувалася б
+# до наступного запису власника (з'єднання береться лише при побудові)
+@router.get("/autocomplete")
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    user_id: int = Depends(current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    return await autocomplete_cache.complete(db, user_id, q, limit)
+
+
+# 📞 API: Чий це номер
+@router.get("/lookup/phone", response_model=List[schemas.ContactOut])
+async def lookup_phone(
+    number: str = Query(..., min_length=3, max_length=50),
+    user_id: int = Depends(current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await crud.find_contacts_by_phone(db, user_id, number)
+
+
+@router.post(
+    "/lookup/phones", response_model=dict[str, List[schemas.ContactOut]]
+)
+async def lookup_phones(
+    body: schemas.PhoneLookupRequest,
+    user_id: int = Depends(current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await crud.find_contacts_by_phones(db, user_id, body.numbers)
+
+
+# 🔄 API: Зміни контактів після курсора (дельта-синхронізація)
+@router.get("/sync", response_model=schemas.ContactSyncPage)
+async def sync_contacts(
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    user_id: int = Depends(current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await changes_since(db, user_id, cursor, limit)
+
+
+# 👯 API: Ймовірні дублікати (спершу догоняє перевірку нових і змінених)
+@router.get("/duplicates", response_model=List[schemas.DuplicatePair])
+async def find_duplicates(
+    user_id: int = Depends(current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    await duplicates.scan(db, user_id)
+    return await duplicates.list_pairs(db, user_id)
+
+
+@router.post("/duplicates/merge", response_model=schemas.ContactOut)
+async def merge_duplicates(
+    body: schemas.MergeRequest,
+    user_id: int = Depends(current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    if body.keep_id == body.merge_id:
+        raise HTTPException(
+            status_code=400, detail="Cannot merge a contact into itself"
+        )
+    contact = await crud.merge_contacts(db, body.keep_id, body.merge_id, user_id)
+    if contact is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return contact
+
+
 # ❌ Видалення контакту
 @router.get("/delete/{contact_id}")
-async def delete_contact(contact_id: int, db: AsyncSession = Depends(get_db)):
-    await crud.delete_contact(db, contact_id)
+async def delete_contact(
+    contact_id: int,
+    user_id: int = Depends(current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    await crud.delete_contact(db, contact_id, user_id)
     return RedirectResponse("/contacts", status_code=303)
@@ -13,11 +13,12 @@ from fastapi.responses import JSONResponse
 from slowapi.util import get_remote_address
 from sqlalchemy.ext.asyncio import AsyncSession
 from services.auth import get_token_from_cookie
-from database import get_db
+from database import get_db, get_read_db
 from models import User
 from config import settings
 from jose import jwt, JWTError
 from middleware.rate_limit import limiter
+from services import tracing
 import crud
 import cloudinary.uploader
 import redis
@@ -53,11 +54,7 @@ async def get_redis():
     return redis
 
 
-async def get_current_user(
-    db: AsyncSession = Depends(get_db),
-    token: str = Depends(get_token_from_cookie),  # Bearer из Authorization
-    access_token: str = Cookie(None),  # Cookie
-):
+async def _load_current_user(db: AsyncSession, token: str, access_token: str):
     actual_token = token or access_token
 
     if actual_token is None:
@@ -88,9 +85,28 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(get_token_from_cookie),  # Bearer из Authorization
+    access_token: str = Cookie(None),  # Cookie
+):
+    with tracing.span("get_current_user"):
+        return await _load_current_user(db, token, access_token)
+
+
+# для read-only маршрутів: користувач читається з репліки
+async def get_current_read_user(
+    db: AsyncSession = Depends(get_read_db),
+    token: str = Depends(get_token_from_cookie),
+    access_token: str = Cookie(None),
+):
+    with tracing.span("get_current_read_user"):
+        return await _load_current_user(db, token, access_token)
+
+
 @router.get("/me")
 @limiter.limit(f"{RATE_LIMIT}/{RATE_WINDOW}seconds")
-async def get_me(request: Request, current_user=Depends(get_current_user)):
+async def get_me(request: Request, current_user=Depends(get_current_read_user)):
     return {
         "id": current_user.id,
         "email": current_user.email,
@@ -106,9 +122,15 @@ async def upload_avatar(
     db: AsyncSession = Depends(get_db),
 ):
     contents = await file.read()
-    res = cloudinary.uploader.upload(
-        contents, folder="avatars", public_id=f"user_{current_user.id}", overwrite=True
-    )
+    with tracing.span("cloudinary.upload", size=len(contents)):
+        traceparent = tracing.current_traceparent()
+        res = cloudinary.uploader.upload(
+            contents,
+            folder="avatars",
+            public_id=f"user_{current_user.id}",
+            overwrite=True,
+            http_headers={"traceparent": traceparent} if traceparent else None,
+        )
     url = res.get("secure_url")
     await crud.update_avatar(db, current_user, url)
     return {"avatar_url": url}
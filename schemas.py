@@ -32,6 +32,35 @@ class ContactOut(ContactBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ContactSyncItem(ContactOut):
+    row_version: int
+
+
+class ContactSyncPage(BaseModel):
+    # reset=True: курсор застарів, клієнт очищає локальні дані і починає з 0
+    reset: bool
+    cursor: int
+    has_more: bool
+    changed: list[ContactSyncItem]
+    deleted: list[int]
+
+
+class DuplicatePair(BaseModel):
+    contact: ContactOut
+    duplicate: ContactOut
+    score: float
+    reasons: list[str]
+
+
+class MergeRequest(BaseModel):
+    keep_id: int
+    merge_id: int
+
+
+class PhoneLookupRequest(BaseModel):
+    numbers: list[str] = Field(..., min_length=1, max_length=500)
+
+
 class ContactInDB(ContactBase):
     id: int
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,176 @@
+"""Продакшн-запуск: gunicorn master + N uvicorn-воркерів.
+
+Застосунок імпортується в master до fork (preload_app), тож код і
+шаблони спільні між воркерами через copy-on-write. Після fork кожен
+воркер скидає успадковані пули з'єднань (database.dispose_after_fork),
+щоб asyncpg-з'єднання не ділились між процесами.
+
+    python serve.py            # запуск (launcher + gunicorn master)
+    python serve.py restart    # rolling restart з новим кодом без простою
+
+Rolling restart міняє master: USR2 запускає новий master дочірнім процесом
+старого, після чого старий завершується. Тому serve.py запускає master не
+сам, а як дочірній процес launcher'а, що стає subreaper (у контейнері —
+PID 1): осиротілий новий master переходить до нього, а launcher живе,
+доки живий хоч один master, пересилає сигнали поточному (з pidfile) і
+прибирає зомбі. Без prctl (не Linux) subreaper недоступний — тоді rolling
+restart працює лише під супервізором, що сам стежить за pidfile.
+
+Кількість воркерів — WEB_CONCURRENCY, або кількість CPU, якщо 0. Формула
+2 * CPU + 1 — для sync-воркерів, що чекають на I/O; async-воркер і так
+тримає CPU зайнятим, а кожен відкриває власні пули до primary, кожної
+репліки і кожного шарда. Якщо задано DB_CONNECTION_BUDGET (з'єднань на
+кожну базу з цього хоста), воркерів не більше, ніж влазить у бюджет.
+"""
+
+import ctypes
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from gunicorn.app.base import BaseApplication
+
+from config import settings
+
+PIDFILE = os.environ.get("GUNICORN_PIDFILE", "/tmp/contacts-gunicorn.pid")
+PR_SET_CHILD_SUBREAPER = 36
+# сигнали, які launcher передає master'у
+FORWARDED_SIGNALS = (
+    signal.SIGTERM,
+    signal.SIGINT,
+    signal.SIGQUIT,
+    signal.SIGHUP,
+    signal.SIGUSR2,
+    signal.SIGTTIN,
+    signal.SIGTTOU,
+)
+# pool_size + max_overflow одного engine (типові значення SQLAlchemy)
+ENGINE_CONNECTIONS = 5 + 10
+
+
+def worker_count() -> int:
+    if settings.WEB_CONCURRENCY:
+        return settings.WEB_CONCURRENCY
+    workers = multiprocessing.cpu_count()
+    if settings.DB_CONNECTION_BUDGET:
+        # з'єднання рахуємо до кожної бази окремо, тож досить пулу одного engine
+        workers = min(workers, settings.DB_CONNECTION_BUDGET // ENGINE_CONNECTIONS)
+    return max(1, workers)
+
+
+def post_fork(server, worker):
+    import database
+
+    database.dispose_after_fork()
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from main import app
+
+        return app
+
+
+def options() -> dict:
+    return {
+        "bind": f"{settings.HOST}:{settings.PORT}",
+        "workers": worker_count(),
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "preload_app": True,
+        "post_fork": post_fork,
+        "pidfile": PIDFILE,
+        "graceful_timeout": settings.GRACEFUL_TIMEOUT,
+        "timeout": 60,
+        "keepalive": 5,
+        # періодична переробка воркерів (з розкидом, щоб не всі одночасно)
+        "max_requests": settings.WORKER_MAX_REQUESTS,
+        "max_requests_jitter": settings.WORKER_MAX_REQUESTS // 10,
+    }
+
+
+def _read_pid(path: str) -> int | None:
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def rolling_restart(ready_timeout: float = 60) -> None:
+    """USR2 -> новий master з новим кодом і воркерами; коли він піднявся,
+    старий master отримує TERM і дочекується завершення запитів."""
+    old_pid = _read_pid(PIDFILE)
+    if old_pid is None:
+        sys.exit(f"No running master ({PIDFILE} not found)")
+    os.kill(old_pid, signal.SIGUSR2)
+
+    # поки старий master живий, новий пише свій pid у <pidfile>.2
+    deadline = time.monotonic() + ready_timeout
+    new_pid = None
+    while time.monotonic() < deadline:
+        new_pid = _read_pid(PIDFILE + ".2")
+        if new_pid is not None:
+            break
+        time.sleep(0.5)
+    if new_pid is None:
+        sys.exit("New master did not start, old one keeps serving")
+
+    time.sleep(settings.WORKER_BOOT_WAIT)  # даємо новим воркерам піднятись
+    os.kill(old_pid, signal.SIGTERM)
+    print(f"master {old_pid} -> {new_pid}")
+
+
+def _become_subreaper() -> bool:
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def launch() -> int:
+    """Запускає master і чекає, доки не завершаться всі його наступники."""
+    if not _become_subreaper():
+        print("prctl(PR_SET_CHILD_SUBREAPER) unavailable", file=sys.stderr)
+    argv = [sys.executable, os.path.abspath(__file__), "master"]
+    master = os.spawnv(os.P_NOWAIT, sys.executable, argv)
+
+    def forward(signum, frame):
+        pid = _read_pid(PIDFILE) or master
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    for signum in FORWARDED_SIGNALS:
+        signal.signal(signum, forward)
+
+    code = 0
+    while True:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            return code
+        # код виходу — процесу, що завершився останнім (за сигналом — 128 + N)
+        code = os.waitstatus_to_exitcode(status)
+        if code < 0:
+            code = 128 - code
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["restart"]:
+        rolling_restart()
+    elif sys.argv[1:] == ["master"]:
+        Server(options()).run()
+    else:
+        sys.exit(launch())
@@ -0,0 +1,223 @@
+"""Admission control: обмеження одночасних запитів за класами маршрутів.
+
+Кожен запит (і фонова робота) бере слот свого класу. Загальна кількість
+слотів дорівнює ємності пулу primary-бази (pool_size + max_overflow),
+тож запити чекають у черзі тут, з дедлайном, а не в пулі SQLAlchemy, де
+всі вони зрештою відвалюються одночасно. Частка слотів на клас обмежена
+ADMISSION_LIMITS, а звільнений слот дістається найпріоритетнішому з
+тих, хто чекає:
+
+    read (GET з перевіреним токеном) > write > bulk > background
+
+Відмова (503 + Retry-After) настає, коли черга повна і новий запит не
+пріоритетніший за найгірший у черзі, коли минув дедлайн очікування, або
+коли середнє очікування з'єднання з пулу (db_pool_wait_seconds)
+перевищує поріг класу — ADMISSION_POOL_WAIT_MS, помножений на множник з
+ADMISSION_POOL_WAIT_SHED; такий запит відкидається одразу, ще до черги.
+Типово першими відкидаються bulk і background, при вдвічі довшому
+очікуванні — write, при вчетверо довшому — і read.
+"""
+
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+from config import settings
+from services import metrics
+
+PRIORITY = {"read": 0, "write": 1, "bulk": 2, "background": 3}
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class PoolWait:
+    """Експоненційне середнє часу очікування з'єднання з пулу."""
+
+    def __init__(self, alpha: float = 0.2, stale_after: float = 5.0):
+        self.alpha = alpha
+        self.stale_after = stale_after
+        self.average = 0.0
+        self._updated = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.average += self.alpha * (seconds - self.average)
+        self._updated = time.monotonic()
+
+    def current(self) -> float:
+        # без нових вимірів давнє середнє вже нічого не означає
+        if time.monotonic() - self._updated > self.stale_after:
+            return 0.0
+        return self.average
+
+
+# наповнюється з database.py (Session after_begin) незалежно від того,
+# чи увімкнено admission control
+pool_wait = PoolWait()
+
+
+class _Waiter:
+    __slots__ = ("route_class", "priority", "seq", "future")
+
+    def __init__(self, route_class: str, seq: int, future: asyncio.Future):
+        self.route_class = route_class
+        self.priority = PRIORITY[route_class]
+        self.seq = seq
+        self.future = future
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        capacity: int,
+        shares: dict[str, float],
+        queue_size: int,
+        timeouts: dict[str, float],
+        pool_wait_threshold: float,
+        pool_wait_shed: dict[str, float] | None = None,
+    ):
+        self.capacity = capacity
+        self.limits = {
+            cls: max(1, round(capacity * shares.get(cls, 1.0))) for cls in PRIORITY
+        }
+        self.queue_size = queue_size
+        self.timeouts = timeouts
+        self.pool_wait_threshold = pool_wait_threshold
+        # поріг очікування пулу, з якого клас відкидається одразу
+        shed = pool_wait_shed or {}
+        self.shed_after = {
+            cls: pool_wait_threshold * shed.get(cls, 1.0) for cls in PRIORITY
+        }
+        self.pool_wait = pool_wait
+        self.active = {cls: 0 for cls in PRIORITY}
+        self._total = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+
+    def _has_room(self, route_class: str) -> bool:
+        return (
+            self._total < self.capacity
+            and self.active[route_class] < self.limits[route_class]
+        )
+
+    def _grant(self, route_class: str) -> None:
+        self.active[route_class] += 1
+        self._total += 1
+
+    def _reject(self, route_class: str, reason: str) -> Rejected:
+        metrics.inc("admission_rejected", route_class=route_class, reason=reason)
+        return Rejected(reason)
+
+    def pool_saturated(self, route_class: str = "background") -> bool:
+        return self.pool_wait.current() > self.shed_after[route_class]
+
+    async def acquire(self, route_class: str) -> None:
+        priority = PRIORITY[route_class]
+        if self.pool_saturated(route_class):
+            raise self._reject(route_class, "pool_wait")
+        if not self._waiters and self._has_room(route_class):
+            self._grant(route_class)
+            metrics.inc("admission_accepted", route_class=route_class)
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            worst = max(self._waiters, key=lambda w: (w.priority, w.seq))
+            if worst.priority <= priority:
+                raise self._reject(route_class, "queue_full")
+            # витісняємо найменш пріоритетного з черги
+            self._waiters.remove(worst)
+            worst.future.set_exception(self._reject(worst.route_class, "evicted"))
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(route_class, next(self._seq), future)
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter.future), self.timeouts.get(route_class, 1.0)
+            )
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._waiters.remove(waiter)
+                waiter.future.cancel()
+                raise self._reject(route_class, "deadline")
+            waiter.future.result()  # слот видали одночасно з дедлайном
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                if waiter.future.exception() is None:
+                    self.release(route_class)
+            else:
+                self._waiters.remove(waiter)
+                waiter.future.cancel()
+            raise
+        metrics.observe(
+            "admission_queue_wait_seconds",
+            time.monotonic() - started,
+            route_class=route_class,
+        )
+        metrics.inc("admission_accepted", route_class=route_class)
+
+    def release(self, route_class: str) -> None:
+        self.active[route_class] -= 1
+        self._total -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._total < self.capacity:
+            eligible = [w for w in self._waiters if self._has_room(w.route_class)]
+            if not eligible:
+                return
+            waiter = min(eligible, key=lambda w: (w.priority, w.seq))
+            self._waiters.remove(waiter)
+            self._grant(waiter.route_class)
+            waiter.future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, route_class: str):
+        await self.acquire(route_class)
+        try:
+            yield
+        finally:
+            self.release(route_class)
+
+
+def _parse(value: str) -> dict[str, float]:
+    return {
+        key.strip(): float(val)
+        for key, val in (item.split("=") for item in value.split(",") if item.strip())
+    }
+
+
+def _capacity() -> int:
+    if settings.ADMISSION_CONCURRENCY:
+        return settings.ADMISSION_CONCURRENCY
+    from database import engine
+
+    pool = engine.sync_engine.pool
+    size = getattr(pool, "size", lambda: 5)()
+    return size + max(getattr(pool, "_max_overflow", 0), 0)
+
+
+_controller: AdmissionController | None = None
+
+
+def enabled() -> bool:
+    return settings.ADMISSION_ENABLED
+
+
+def controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            capacity=_capacity(),
+            shares=_parse(settings.ADMISSION_LIMITS),
+            queue_size=settings.ADMISSION_QUEUE_SIZE,
+            timeouts=_parse(settings.ADMISSION_QUEUE_TIMEOUTS),
+            pool_wait_threshold=settings.ADMISSION_POOL_WAIT_MS / 1000,
+            pool_wait_shed=_parse(settings.ADMISSION_POOL_WAIT_SHED),
+        )
+    return _controller
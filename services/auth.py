@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime, timedelta
 from jose import jwt
 from passlib.context import CryptContext
@@ -31,13 +32,20 @@ def create_refresh_token(subject: str | int, expires_delta: timedelta | None = N
     expire = datetime.utcnow() + (
         expires_delta or timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     )
-    to_encode = {"sub": str(subject), "exp": expire}
+    # jti — ідентифікатор для відкликання (services/revocation.py)
+    to_encode = {"sub": str(subject), "exp": expire, "jti": uuid.uuid4().hex}
     encoded = jwt.encode(
         to_encode, settings.REFRESH_SECRET_KEY, algorithm=settings.ALGORITHM
     )
     return encoded
 
 
+def decode_refresh_token(token: str):
+    return jwt.decode(
+        token, settings.REFRESH_SECRET_KEY, algorithms=[settings.ALGORITHM]
+    )
+
+
 def decode_access_token(token: str):
     return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
 
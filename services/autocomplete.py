@@ -0,0 +1,137 @@
+"""Автодоповнення контактів за префіксом.
+
+Для кожного власника лениво будується відсортований масив ключів
+(ім'я, прізвище, "ім'я прізвище", "прізвище ім'я", email) у нижньому
+регістрі; пошук префікса — bisect по масиву. Індекси зберігаються в LRU з
+обмеженням на сумарну кількість ключів (AUTOCOMPLETE_MAX_ENTRIES) і
+скидаються за подіями owner_contacts шини інвалідації (services.invalidation),
+зокрема з інших воркерів. Будувати індекс треба з primary: побудова з
+репліки, що відстає, лишилася б у кеші до наступної інвалідації.
+"""
+
+import bisect
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models import Contact
+from services.invalidation import invalidation_bus
+
+
+class PrefixIndex:
+    __slots__ = ("keys", "entries")
+
+    def __init__(self, rows):
+        items = []
+        for contact_id, first_name, last_name, email in rows:
+            label = f"{first_name} {last_name}"
+            entry = (contact_id, label, email)
+            for key in {
+                first_name,
+                last_name,
+                label,
+                f"{last_name} {first_name}",
+                email,
+            }:
+                items.append((key.casefold(), entry))
+        items.sort(key=lambda item: item[0])
+        self.keys = [key for key, _ in items]
+        self.entries = [entry for _, entry in items]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, prefix: str, limit: int) -> list[tuple[int, str, str]]:
+        prefix = prefix.casefold()
+        i = bisect.bisect_left(self.keys, prefix)
+        seen, result = set(), []
+        while i < len(self.keys) and self.keys[i].startswith(prefix):
+            entry = self.entries[i]
+            if entry[0] not in seen:
+                seen.add(entry[0])
+                result.append(entry)
+                if len(result) >= limit:
+                    break
+            i += 1
+        return result
+
+
+class _Build:
+    """Побудова індексу, що виконується; інвалідація позначає її застарілою."""
+
+    __slots__ = ("stale",)
+
+    def __init__(self):
+        self.stale = False
+
+
+class AutocompleteCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._indexes: OrderedDict[int, PrefixIndex] = OrderedDict()
+        self._size = 0
+        # owner_id -> побудови в процесі; запис живе лише поки вони тривають,
+        # тож події про власників без побудови нічого не залишають
+        self._building: dict[int, set[_Build]] = {}
+
+    def invalidate(self, owner_id: int) -> None:
+        for build in self._building.get(owner_id, ()):
+            build.stale = True
+        index = self._indexes.pop(owner_id, None)
+        if index is not None:
+            self._size -= len(index)
+
+    def clear(self) -> None:
+        self._indexes.clear()
+        self._size = 0
+        for builds in self._building.values():
+            for build in builds:
+                build.stale = True
+
+    def _store(self, owner_id: int, index: PrefixIndex) -> None:
+        old = self._indexes.pop(owner_id, None)
+        if old is not None:
+            self._size -= len(old)
+        self._indexes[owner_id] = index
+        self._size += len(index)
+        while self._size > self.max_entries and len(self._indexes) > 1:
+            _, evicted = self._indexes.popitem(last=False)
+            self._size -= len(evicted)
+
+    async def get_index(self, db: AsyncSession, owner_id: int) -> PrefixIndex:
+        index = self._indexes.get(owner_id)
+        if index is not None:
+            self._indexes.move_to_end(owner_id)
+            return index
+        build = _Build()
+        self._building.setdefault(owner_id, set()).add(build)
+        try:
+            result = await db.execute(
+                select(Contact.id, Contact.first_name, Contact.last_name, Contact.email)
+                .where(Contact.owner_id == owner_id)
+            )
+            index = PrefixIndex(result.all())
+        finally:
+            builds = self._building[owner_id]
+            builds.discard(build)
+            if not builds:
+                del self._building[owner_id]
+        if not build.stale:
+            self._store(owner_id, index)
+        return index
+
+    async def complete(
+        self, db: AsyncSession, owner_id: int, prefix: str, limit: int = 10
+    ) -> list[dict]:
+        index = await self.get_index(db, owner_id)
+        return [
+            {"id": contact_id, "label": label, "email": email}
+            for contact_id, label, email in index.lookup(prefix, limit)
+        ]
+
+
+autocomplete_cache = AutocompleteCache(settings.AUTOCOMPLETE_MAX_ENTRIES)
+invalidation_bus.subscribe("owner_contacts", autocomplete_cache.invalidate)
+invalidation_bus.on_flush(autocomplete_cache.clear)
@@ -0,0 +1,305 @@
+"""Щоденний дайджест найближчих днів народження.
+
+Один set-based прохід по contacts на кожному шарді: вибираються всі
+контакти, чий день народження (місяць*100 + день) потрапляє у вікно, з
+сортуванням за owner_id, і результат читається потоком групами по
+власнику. На кожного власника ставиться одна задача відправки листа
+(не більше BIRTHDAY_DIGEST_CONCURRENCY одночасно).
+
+Прогрес зберігається в digest_checkpoints (усі owner_id <= last_owner_id
+оброблені) та digest_log, тож після падіння запуск продовжується з місця
+зупинки без повторних листів. Власник спершу "займається" (рядок
+digest_log зі status="claimed" комітиться до відправки), потім лист
+надсилається і рядок позначається "sent". Невдала відправка знімає
+claim (наступний запуск повторить), а падіння між відправкою й позначкою
+лишає "claimed" — такого власника не надсилаємо вдруге.
+
+Між воркерами запуск захищає Redis-lock з TTL LOCK_TTL, який
+продовжується, поки запуск триває.
+
+    python -m services.birthday_digest [YYYY-MM-DD]
+"""
+
+import asyncio
+import collections
+import logging
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+
+import redis.asyncio as aioredis
+from sqlalchemy import delete, extract, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from database import AsyncSessionLocal, engine, shards
+from models import Contact, DigestCheckpoint, DigestLog, User
+from services import admission
+from services.email import send_birthday_digest
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_EVERY = 100  # власників між записами checkpoint
+LOCK_TTL = 300  # секунд; продовжується кожні LOCK_TTL / 3, поки запуск триває
+
+# продовжити / зняти lock, лише якщо він досі наш
+_RENEW_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def next_birthday(dob: date, today: date) -> date:
+    # 29 лютого в невисокосний рік святкуємо 28-го
+    for year in (today.year, today.year + 1):
+        try:
+            day = dob.replace(year=year)
+        except ValueError:
+            day = date(year, 2, 28)
+        if day >= today:
+            return day
+    return day
+
+
+def window_keys(today: date, days: int) -> list[int]:
+    """Ключі місяць*100+день для днів [today, today + days]."""
+    keys = set()
+    for i in range(days + 1):
+        day = today + timedelta(days=i)
+        keys.add(day.month * 100 + day.day)
+        if day.month == 2 and day.day == 28:
+            keys.add(229)
+    return sorted(keys)
+
+
+def _contact_sources():
+    if shards.enabled:
+        return list(shards.engines.items())
+    return [("primary", engine)]
+
+
+async def _load_progress(run_date: date, shard: str) -> tuple[int, set[int]]:
+    async with AsyncSessionLocal() as db:
+        checkpoint = await db.get(DigestCheckpoint, (run_date, shard))
+        watermark = checkpoint.last_owner_id if checkpoint else 0
+        sent = set(
+            (
+                await db.execute(
+                    select(DigestLog.owner_id).where(
+                        DigestLog.run_date == run_date, DigestLog.owner_id > watermark
+                    )
+                )
+            ).scalars()
+        )
+    return watermark, sent
+
+
+async def _save_checkpoint(run_date: date, shard: str, watermark: int) -> None:
+    async with AsyncSessionLocal() as db:
+        checkpoint = await db.get(DigestCheckpoint, (run_date, shard))
+        if checkpoint is None:
+            db.add(
+                DigestCheckpoint(run_date=run_date, shard=shard, last_owner_id=watermark)
+            )
+        else:
+            checkpoint.last_owner_id = watermark
+        await db.commit()
+
+
+async def _send_digest(run_date: date, owner_id: int, birthdays: list) -> None:
+    async with AsyncSessionLocal() as db:
+        # claim до відправки: не вийшло — власника вже взяв інший запуск
+        db.add(DigestLog(run_date=run_date, owner_id=owner_id, status="claimed"))
+        try:
+            await db.commit()
+        except IntegrityError:
+            return
+        entry = (DigestLog.run_date == run_date, DigestLog.owner_id == owner_id)
+        try:
+            user = await db.get(User, owner_id)
+            if user is not None and user.is_active:
+                await asyncio.to_thread(send_birthday_digest, user.email, birthdays)
+        except Exception:
+            # лист не пішов — знімаємо claim, наступний запуск повторить;
+            # при скасуванні (лист міг піти) claim лишається
+            await db.rollback()
+            await db.execute(delete(DigestLog).where(*entry))
+            await db.commit()
+            raise
+        await db.execute(update(DigestLog).where(*entry).values(status="sent"))
+        await db.commit()
+
+
+async def _send_with_admission(run_date: date, owner_id: int, birthdays: list) -> None:
+    # фонова робота поступається запитам користувачів; при відмові — пізніше
+    if not admission.enabled():
+        return await _send_digest(run_date, owner_id, birthdays)
+    while True:
+        try:
+            async with admission.controller().slot("background"):
+                return await _send_digest(run_date, owner_id, birthdays)
+        except admission.Rejected:
+            await asyncio.sleep(settings.ADMISSION_RETRY_AFTER)
+
+
+async def _group_by_owner(result):
+    owner_id, group = None, []
+    async for row in result:
+        if row.owner_id != owner_id and group:
+            yield owner_id, group
+            group = []
+        owner_id = row.owner_id
+        group.append(row)
+    if group:
+        yield owner_id, group
+
+
+async def run_shard(run_date: date, shard: str, shard_engine, days: int) -> int:
+    watermark, sent = await _load_progress(run_date, shard)
+    semaphore = asyncio.Semaphore(settings.BIRTHDAY_DIGEST_CONCURRENCY)
+    # власники в порядку owner_id; None — вже оброблений раніше
+    frontier: collections.deque[tuple[int, asyncio.Task | None]] = collections.deque()
+    stalled = False  # невдала відправка тримає watermark до наступного запуску
+    saved, queued = watermark, 0
+
+    def advance():
+        nonlocal watermark, stalled
+        while frontier and not stalled:
+            owner_id, task = frontier[0]
+            if task is not None:
+                if not task.done():
+                    break
+                if task.exception() is not None:
+                    stalled = True
+                    break
+            watermark = owner_id
+            frontier.popleft()
+
+    async def send(owner_id, birthdays):
+        try:
+            await _send_with_admission(run_date, owner_id, birthdays)
+        except Exception:
+            logger.exception("Birthday digest for owner %s failed", owner_id)
+            raise
+        finally:
+            semaphore.release()
+
+    month_day = extract("month", Contact.date_of_birth) * 100 + extract(
+        "day", Contact.date_of_birth
+    )
+    stmt = (
+        select(
+            Contact.owner_id,
+            Contact.first_name,
+            Contact.last_name,
+            Contact.date_of_birth,
+        )
+        .where(month_day.in_(window_keys(run_date, days)))
+        .where(Contact.owner_id > watermark)
+        .order_by(Contact.owner_id)
+    )
+    async with shard_engine.connect() as conn:
+        result = await conn.stream(stmt)
+        async for owner_id, rows in _group_by_owner(result):
+            if owner_id in sent:
+                frontier.append((owner_id, None))
+            else:
+                birthdays = sorted(
+                    (
+                        next_birthday(r.date_of_birth, run_date),
+                        f"{r.first_name} {r.last_name}",
+                    )
+                    for r in rows
+                )
+                await semaphore.acquire()
+                task = asyncio.create_task(send(owner_id, birthdays))
+                frontier.append((owner_id, task))
+                queued += 1
+            advance()
+            if watermark - saved >= CHECKPOINT_EVERY:
+                await _save_checkpoint(run_date, shard, watermark)
+                saved = watermark
+
+    tasks = [task for _, task in frontier if task is not None]
+    await asyncio.gather(*tasks, return_exceptions=True)
+    advance()
+    if watermark != saved:
+        await _save_checkpoint(run_date, shard, watermark)
+    return queued
+
+
+async def run_digest(run_date: date | None = None) -> int:
+    run_date = run_date or date.today()
+    queued = 0
+    for shard, shard_engine in _contact_sources():
+        queued += await run_shard(
+            run_date, shard, shard_engine, settings.BIRTHDAY_DIGEST_DAYS
+        )
+    logger.info("Birthday digest %s: %s emails queued", run_date, queued)
+    return queued
+
+
+async def _run_locked(redis, run_date: date) -> None:
+    """run_digest під Redis-lock; lock продовжується, поки запуск триває."""
+    lock, token = f"birthday_digest:{run_date}", uuid.uuid4().hex
+    if not await redis.set(lock, token, nx=True, ex=LOCK_TTL):
+        return
+    run = asyncio.create_task(run_digest(run_date))
+    try:
+        while not run.done():
+            await asyncio.wait({run}, timeout=LOCK_TTL / 3)
+            if run.done():
+                break
+            try:
+                renewed = await redis.eval(_RENEW_LOCK, 1, lock, token, LOCK_TTL)
+            except Exception:
+                # claims у digest_log і так не дадуть надіслати двічі
+                logger.exception("Birthday digest lock renewal failed")
+                continue
+            if not renewed:
+                logger.error("Birthday digest lock for %s lost, stopping", run_date)
+                run.cancel()
+                await asyncio.gather(run, return_exceptions=True)
+                return
+        await run
+    finally:
+        if not run.done():
+            run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+        await redis.eval(_RELEASE_LOCK, 1, lock, token)
+
+
+async def schedule_daily() -> None:
+    """Запускає дайджест щодня о BIRTHDAY_DIGEST_HOUR; між воркерами —
+    через Redis-lock, тож одночасно працює лише один."""
+    redis = await aioredis.from_url(settings.REDIS_URL)
+    while True:
+        now = datetime.now()
+        run_at = now.replace(
+            hour=settings.BIRTHDAY_DIGEST_HOUR, minute=0, second=0, microsecond=0
+        )
+        if run_at <= now:
+            run_date = run_at.date()  # сьогоднішній запуск міг не завершитись
+        else:
+            await asyncio.sleep((run_at - now).total_seconds())
+            run_date = run_at.date()
+        try:
+            await _run_locked(redis, run_date)
+        except Exception:
+            logger.exception("Birthday digest run failed")
+        tomorrow = datetime.combine(run_date + timedelta(days=1), datetime.min.time())
+        await asyncio.sleep(max(0.0, (tomorrow - datetime.now()).total_seconds()))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    day = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(f"queued {asyncio.run(run_digest(day))} digests")
@@ -0,0 +1,129 @@
+"""Статистика контактів власника (таблиця contact_stats).
+
+Кожен запис у contacts через crud.py змінює лічильники атомарним
+UPDATE ... SET col = col + delta у тій самій транзакції, тож читання
+статистики — один запит за первинним ключем.
+
+Повний перерахунок (наприклад, після ручних змін у базі):
+
+    python -m services.contact_stats [owner_id]
+"""
+
+import asyncio
+import sys
+from collections import Counter
+
+from sqlalchemy import case, delete, extract, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Contact, ContactStats
+
+MONTH_COLUMNS = [f"born_{m:02d}" for m in range(1, 13)]
+COUNTERS = ["total", "missing_information", "missing_birthday", *MONTH_COLUMNS]
+
+
+def contact_counters(contact) -> Counter:
+    """Внесок одного контакту в лічильники."""
+    counters = Counter(total=1)
+    if not contact.information:
+        counters["missing_information"] += 1
+    if contact.date_of_birth is None:
+        counters["missing_birthday"] += 1
+    else:
+        counters[MONTH_COLUMNS[contact.date_of_birth.month - 1]] += 1
+    return counters
+
+
+def counters_delta(before, after) -> dict[str, int]:
+    """Різниця лічильників між двома станами контакту (None — немає)."""
+    delta = Counter()
+    if after is not None:
+        delta.update(contact_counters(after))
+    if before is not None:
+        delta.subtract(contact_counters(before))
+    return {k: v for k, v in delta.items() if v}
+
+
+async def apply_delta(db: AsyncSession, owner_id: int, delta: dict[str, int]) -> None:
+    """Додає delta до рядка власника (без commit — транзакція викликача)."""
+    if not delta:
+        return
+    values = {k: getattr(ContactStats, k) + v for k, v in delta.items()}
+    stmt = update(ContactStats).where(ContactStats.owner_id == owner_id)
+    result = await db.execute(stmt.values(**values))
+    if result.rowcount:
+        return
+    # першого рядка ще немає; паралельний запис міг встигнути раніше
+    try:
+        async with db.begin_nested():
+            row = {k: 0 for k in COUNTERS}
+            row.update(delta)
+            await db.execute(insert(ContactStats).values(owner_id=owner_id, **row))
+    except IntegrityError:
+        await db.execute(stmt.values(**values))
+
+
+async def get_stats(db: AsyncSession, owner_id: int) -> dict:
+    stats = await db.get(ContactStats, owner_id)
+    counts = {k: getattr(stats, k) if stats else 0 for k in COUNTERS}
+    return {
+        "total": counts["total"],
+        "by_birth_month": {m: counts[c] for m, c in enumerate(MONTH_COLUMNS, start=1)},
+        "missing": {
+            "information": counts["missing_information"],
+            "date_of_birth": counts["missing_birthday"],
+        },
+    }
+
+
+def _aggregate_query(owner_id: int | None = None):
+    month = extract("month", Contact.date_of_birth)
+
+    def count_if(condition):
+        return func.sum(case((condition, 1), else_=0))
+
+    stmt = select(
+        Contact.owner_id,
+        func.count(),
+        count_if(or_(Contact.information.is_(None), Contact.information == "")),
+        count_if(Contact.date_of_birth.is_(None)),
+        *(count_if(month == m) for m in range(1, 13)),
+    ).group_by(Contact.owner_id)
+    if owner_id is not None:
+        stmt = stmt.where(Contact.owner_id == owner_id)
+    return stmt
+
+
+async def rebuild(conn, owner_id: int | None = None) -> None:
+    """Перераховує contact_stats з нуля (для всіх або одного власника).
+
+    conn — AsyncConnection у відкритій транзакції на базі з contacts.
+    """
+    if conn.dialect.name == "postgresql":
+        # чекаємо незавершені записи і не пускаємо нові до кінця перерахунку
+        await conn.exec_driver_sql("LOCK TABLE contact_stats IN EXCLUSIVE MODE")
+    stmt = delete(ContactStats)
+    if owner_id is not None:
+        stmt = stmt.where(ContactStats.owner_id == owner_id)
+    await conn.execute(stmt)
+    await conn.execute(
+        insert(ContactStats).from_select(
+            ["owner_id", *COUNTERS], _aggregate_query(owner_id)
+        )
+    )
+
+
+async def _main(argv: list[str]) -> None:
+    from database import engine, shards
+
+    owner_id = int(argv[0]) if argv else None
+    engines = set(shards.engines.values()) if shards.enabled else {engine}
+    for e in engines:
+        async with e.begin() as conn:
+            await rebuild(conn, owner_id)
+    print("contact_stats rebuilt")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
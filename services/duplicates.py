@@ -0,0 +1,322 @@
+"""Пошук дублікатів серед контактів власника (GET /contacts/duplicates).
+
+Пари порівнюються не всі з усіма (O(n²)), а лише всередині кошиків за
+ключами блокування:
+
+- email у нижньому регістрі;
+- phone_normalized;
+- фонетичний ключ імені (last_name_phonetic + first_name_phonetic).
+
+Кошики, більші за DUPLICATE_MAX_BUCKET (спільний офісний номер тощо),
+пропускаються. Пари з оцінкою від DUPLICATE_MIN_SCORE зберігаються в
+contact_duplicates; злиття пари — crud.merge_contacts. Спільний телефон
+сам по собі (родина, офіс) до порогу не дотягує — потрібен ще один збіг.
+
+Перевірка інкрементальна: contact_dedup_state пам'ятає версію власника
+(services/sync.py), до якої контакти вже перевірені, і наступний прохід
+бере лише контакти з row_version після неї, їхніх сусідів по кошиках та
+tombstones видалених. Якщо ця версія нижча за floor синхронізації
+(tombstones прибрані, власника перенесено на інший шард), власник
+перевіряється повністю.
+
+Запис контакту перевірку не запускає: власник догоняє її при
+GET /contacts/duplicates, решта — фоновим проходом по всіх власниках зі
+змінами (наприклад, з cron):
+
+    python -m services.duplicates scan
+"""
+
+import asyncio
+import itertools
+import sys
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from config import settings
+from models import (
+    Contact,
+    ContactDedupState,
+    ContactDuplicate,
+    ContactSyncState,
+    ContactTombstone,
+)
+from services import metrics
+from services.phonetic import distance
+
+# телефон нижче за типовий DUPLICATE_MIN_SCORE: сам він пари не дає
+WEIGHTS = {"email": 0.5, "phone": 0.4, "name": 0.4, "birthday": 0.2}
+NAME_SIMILARITY = 0.8  # нижче — імена вважаються різними
+CHUNK = 500  # розмір списків у IN (...)
+
+_COLUMNS = (
+    Contact.id,
+    Contact.email,
+    Contact.phone_normalized,
+    Contact.first_name_phonetic,
+    Contact.last_name_phonetic,
+    Contact.first_name_translit,
+    Contact.last_name_translit,
+    Contact.date_of_birth,
+)
+
+
+def _email(row) -> str | None:
+    # EmailStr уже без пробілів; той самий ключ, що lower(email) в індексі
+    return row.email.lower() if row.email else None
+
+
+def _name(row) -> str:
+    return " ".join(n for n in (row.first_name_translit, row.last_name_translit) if n)
+
+
+def blocking_keys(row) -> list[tuple]:
+    keys = []
+    if email := _email(row):
+        keys.append(("email", email))
+    if row.phone_normalized:
+        keys.append(("phone", row.phone_normalized))
+    if row.first_name_phonetic and row.last_name_phonetic:
+        keys.append(("name", row.last_name_phonetic, row.first_name_phonetic))
+    return keys
+
+
+def score_pair(a, b) -> tuple[float, list[str]]:
+    """Оцінка 0..1 і збіги, з яких вона складається."""
+    reasons = []
+    total = 0.0
+    if _email(a) and _email(a) == _email(b):
+        reasons.append("email")
+    if a.phone_normalized and a.phone_normalized == b.phone_normalized:
+        reasons.append("phone")
+    name_a, name_b = _name(a), _name(b)
+    if name_a and name_b:
+        similarity = 1 - distance(name_a, name_b) / max(len(name_a), len(name_b))
+        if similarity >= NAME_SIMILARITY:
+            reasons.append("name")
+            total += WEIGHTS["name"] * similarity
+    if a.date_of_birth and a.date_of_birth == b.date_of_birth:
+        reasons.append("birthday")
+    total += sum(WEIGHTS[r] for r in reasons if r != "name")
+    return min(round(total, 3), 1.0), reasons
+
+
+def find_pairs(rows, changed: set[int] | None = None) -> dict[tuple[int, int], tuple]:
+    """Пари (менший id, більший id) -> (оцінка, збіги) всередині кошиків.
+    changed — порівнювати лише пари, де є хоч один із цих контактів."""
+    buckets = defaultdict(list)
+    for row in rows:
+        for key in blocking_keys(row):
+            buckets[key].append(row)
+    found = {}
+    for members in buckets.values():
+        if not 1 < len(members) <= settings.DUPLICATE_MAX_BUCKET:
+            continue
+        for a, b in itertools.combinations(members, 2):
+            if changed is not None and a.id not in changed and b.id not in changed:
+                continue
+            pair = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+            if pair in found:
+                continue
+            score, reasons = score_pair(a, b)
+            if score >= settings.DUPLICATE_MIN_SCORE:
+                found[pair] = (score, reasons)
+    return found
+
+
+def _chunks(items: list, size: int = CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+async def forget(db: AsyncSession, owner_id: int, contact_ids) -> None:
+    """Прибирає пари з цими контактами (без commit)."""
+    for chunk in _chunks(sorted(contact_ids)):
+        await db.execute(
+            delete(ContactDuplicate).where(
+                ContactDuplicate.owner_id == owner_id,
+                or_(
+                    ContactDuplicate.contact_id.in_(chunk),
+                    ContactDuplicate.duplicate_id.in_(chunk),
+                ),
+            )
+        )
+
+
+async def _neighbours(db: AsyncSession, owner_id: int, changed: list) -> list:
+    """Контакти власника, що ділять кошик хоч з одним зі змінених."""
+    emails = {_email(r) for r in changed if r.email}
+    phones = {r.phone_normalized for r in changed if r.phone_normalized}
+    names = {r.last_name_phonetic for r in changed if r.last_name_phonetic}
+    rows = {r.id: r for r in changed}
+    for column, values in (
+        # кошик email — за нижнім регістром (ix_contacts_owner_email_lower)
+        (func.lower(Contact.email), emails),
+        (Contact.phone_normalized, phones),
+        (Contact.last_name_phonetic, names),
+    ):
+        for chunk in _chunks(sorted(values)):
+            result = await db.execute(
+                select(*_COLUMNS).where(Contact.owner_id == owner_id, column.in_(chunk))
+            )
+            rows.update((r.id, r) for r in result)
+    return list(rows.values())
+
+
+async def scan(db: AsyncSession, owner_id: int) -> int:
+    """Перевіряє контакти, змінені після попереднього проходу, і комітить.
+    Повертає кількість знайдених пар."""
+    state = (
+        await db.execute(
+            select(ContactSyncState.version, ContactSyncState.floor).where(
+                ContactSyncState.owner_id == owner_id
+            )
+        )
+    ).first()
+    high, floor = state if state else (0, 0)
+    dedup = await db.get(ContactDedupState, owner_id)
+    done = dedup.version if dedup else 0
+    if dedup is not None and done == high:
+        return 0
+
+    if not done or done < floor or done > high:
+        rows = (
+            await db.execute(select(*_COLUMNS).where(Contact.owner_id == owner_id))
+        ).all()
+        await db.execute(
+            delete(ContactDuplicate).where(ContactDuplicate.owner_id == owner_id)
+        )
+        found = find_pairs(rows)
+    else:
+        # лише версії <= high: усі вони вже закомічені (див. services/sync.py)
+        changed = (
+            await db.execute(
+                select(*_COLUMNS).where(
+                    Contact.owner_id == owner_id,
+                    Contact.row_version > done,
+                    Contact.row_version <= high,
+                )
+            )
+        ).all()
+        deleted = (
+            await db.execute(
+                select(ContactTombstone.contact_id).where(
+                    ContactTombstone.owner_id == owner_id,
+                    ContactTombstone.row_version > done,
+                    ContactTombstone.row_version <= high,
+                )
+            )
+        ).scalars().all()
+        ids = {r.id for r in changed}
+        await forget(db, owner_id, ids | set(deleted))
+        found = find_pairs(await _neighbours(db, owner_id, changed), ids)
+
+    if found:
+        await db.execute(
+            insert(ContactDuplicate),
+            [
+                {
+                    "owner_id": owner_id,
+                    "contact_id": a,
+                    "duplicate_id": b,
+                    "score": score,
+                    "reasons": ",".join(reasons),
+                }
+                for (a, b), (score, reasons) in found.items()
+            ],
+        )
+    if dedup is None:
+        db.add(ContactDedupState(owner_id=owner_id, version=high))
+    else:
+        dedup.version = high
+    try:
+        await db.commit()
+    except IntegrityError:
+        # паралельний прохід того ж власника встиг першим
+        await db.rollback()
+        return 0
+    metrics.inc("duplicate_scans", mode="incremental" if done else "full")
+    return len(found)
+
+
+async def list_pairs(db: AsyncSession, owner_id: int) -> list[dict]:
+    """Збережені пари власника, найімовірніші першими."""
+    first, second = aliased(Contact), aliased(Contact)
+    result = await db.execute(
+        select(ContactDuplicate, first, second)
+        .join(first, first.id == ContactDuplicate.contact_id)
+        .join(second, second.id == ContactDuplicate.duplicate_id)
+        .where(
+            ContactDuplicate.owner_id == owner_id,
+            first.owner_id == owner_id,
+            second.owner_id == owner_id,
+        )
+        .order_by(ContactDuplicate.score.desc(), ContactDuplicate.contact_id)
+    )
+    return [
+        {
+            "contact": a,
+            "duplicate": b,
+            "score": pair.score,
+            "reasons": pair.reasons.split(","),
+        }
+        for pair, a, b in result
+    ]
+
+
+def merged_information(keep: Contact, other: Contact) -> str | None:
+    """information злитого контакту: нічого з other не губиться."""
+    parts = [keep.information]
+    if other.information and other.information != keep.information:
+        parts.append(other.information)
+    extra = []
+    if _email(other) != _email(keep):
+        extra.append(other.email)
+    if other.phone_normalized != keep.phone_normalized:
+        extra.append(other.phone)
+    if extra:
+        parts.append("Також: " + ", ".join(extra))
+    return "\n".join(p for p in parts if p) or None
+
+
+async def reset(conn, owner_id: int) -> None:
+    """Забуває пари й прогрес власника (після перенесення на інший шард).
+    conn — AsyncConnection у транзакції."""
+    for table in (ContactDuplicate.__table__, ContactDedupState.__table__):
+        await conn.execute(delete(table).where(table.c.owner_id == owner_id))
+
+
+async def _main() -> None:
+    from database import engine, shards
+
+    engines = set(shards.engines.values()) if shards.enabled else {engine}
+    owners = pairs = 0
+    for e in engines:
+        async with e.connect() as conn:
+            pending = (
+                await conn.execute(
+                    select(ContactSyncState.owner_id)
+                    .outerjoin(
+                        ContactDedupState,
+                        ContactDedupState.owner_id == ContactSyncState.owner_id,
+                    )
+                    .where(
+                        func.coalesce(ContactDedupState.version, -1)
+                        != ContactSyncState.version
+                    )
+                )
+            ).scalars().all()
+        for owner_id in pending:
+            async with AsyncSession(e, expire_on_commit=False) as db:
+                pairs += await scan(db, owner_id)
+            owners += 1
+    print(f"{owners} owners scanned, {pairs} duplicate pairs found")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["scan"]:
+        sys.exit(__doc__)
+    asyncio.run(_main())
@@ -4,11 +4,13 @@ from jose import jwt
 from config import settings
 from email.message import EmailMessage
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 from models import Contact, User
 from database import get_db, engine
+from services.invalidation import invalidation_bus
+from services.tracing import traced
 import smtplib
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -28,6 +30,7 @@ conf = ConnectionConfig(
 
 
 # helper to send verification email (simple SMTP)
+@traced()
 def send_verification_email(to_email: str, token: str):
     verify_link = f"http://localhost:8011/auth/confirm-email?token={token}"
     msg = EmailMessage()
@@ -39,8 +42,24 @@ def send_verification_email(to_email: str, token: str):
         smtp.send_message(msg)
 
 
+# щоденний дайджест днів народження (services/birthday_digest.py)
+def send_birthday_digest(to_email: str, birthdays: list[tuple[date, str]]):
+    lines = [f"{day:%d.%m} — {name}" for day, name in birthdays]
+    msg = EmailMessage()
+    msg["Subject"] = "Найближчі дні народження"
+    msg["From"] = "no-reply@example.com"
+    msg["To"] = to_email
+    msg.set_content("Найближчі дні народження ваших контактів:\n\n" + "\n".join(lines))
+    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as smtp:
+        smtp.send_message(msg)
+
+
+# побудований один раз: гарячий шлях логіну (див. crud.py)
+_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+
+
 async def get_user_by_email(db: AsyncSession, email: str):
-    result = await db.execute(select(User).where(User.email == email))
+    result = await db.execute(_USER_BY_EMAIL, {"email": email})
     return result.scalars().first()  # .scalar_one_or_none()
 
 
@@ -73,4 +92,5 @@ async def confirm_email(token: str, db: AsyncSession = Depends(get_db)):
 
     user.is_verified = True
     await db.commit()
+    await invalidation_bus.publish("user", user.id)
     return {"message": "Email successfully confirmed"}
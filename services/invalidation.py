@@ -0,0 +1,163 @@
+"""Шина інвалідації локальних кешів між воркерами (Redis pub/sub).
+
+Після commit crud.py публікує типізовану подію (``user:<id>``,
+``owner_contacts:<id>``). Подія одразу обробляється в поточному процесі і
+розсилається в канал; кожен воркер у run() слухає канал і викликає
+підписані обробники. Pub/sub не гарантує доставку, тому після кожного
+(пере)підключення всі локальні кеші скидаються повністю (on_flush).
+
+Публікація йде окремим клієнтом із socket_timeout, бо виконується в
+запиті на запис. Події, які не вдалося опублікувати, чекають у черзі і
+відправляються першими при наступній публікації, а також із run() кожні
+RETRY_AFTER секунд тиші в каналі та після перепідключення.
+"""
+
+import asyncio
+import collections
+import json
+import logging
+import time
+import uuid
+from typing import Callable
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from config import settings
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+FLUSH = "flush"
+RETRY_AFTER = 5  # секунд між спробами опублікувати чергу після помилки
+
+
+class InvalidationBus:
+    def __init__(self, redis_url: str, max_pending: int = 10_000):
+        self.redis_url = redis_url
+        self.origin = uuid.uuid4().hex
+        self._redis = None  # підписка: читання блокується до нової події
+        self._publisher = None
+        self._handlers: dict[str, list[Callable[[int], None]]] = (
+            collections.defaultdict(list)
+        )
+        self._flush_handlers: list[Callable[[], None]] = []
+        # події, які не вдалося опублікувати (Redis недоступний)
+        self._pending: collections.deque[str] = collections.deque()
+        self._max_pending = max_pending
+        self._overflowed = False
+        self._down_until = 0.0
+
+    async def _get_redis(self):
+        if self._redis is None:
+            self._redis = await aioredis.from_url(
+                self.redis_url, socket_connect_timeout=2
+            )
+        return self._redis
+
+    async def _get_publisher(self):
+        if self._publisher is None:
+            self._publisher = await aioredis.from_url(
+                self.redis_url, socket_connect_timeout=1, socket_timeout=1
+            )
+        return self._publisher
+
+    def subscribe(self, kind: str, handler: Callable[[int], None]) -> None:
+        self._handlers[kind].append(handler)
+
+    def on_flush(self, handler: Callable[[], None]) -> None:
+        self._flush_handlers.append(handler)
+
+    def flush_local(self) -> None:
+        metrics.inc("cache_invalidation_flushes")
+        for handler in self._flush_handlers:
+            handler()
+
+    def _dispatch(self, kind: str, key: str) -> None:
+        if kind == FLUSH:
+            self.flush_local()
+            return
+        metrics.inc("cache_invalidation_events", kind=kind)
+        for handler in self._handlers.get(kind, ()):
+            handler(int(key))
+
+    def _message(self, event: str) -> str:
+        return json.dumps({"origin": self.origin, "event": event})
+
+    async def publish(self, kind: str, key: int | str) -> None:
+        """Інвалідує локально і розсилає іншим воркерам."""
+        self._dispatch(kind, str(key))
+        if len(self._pending) >= self._max_pending:
+            # забагато втрачених подій — інші воркери скинуть усе
+            self._pending.clear()
+            self._overflowed = True
+        else:
+            self._pending.append(self._message(f"{kind}:{key}"))
+        await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        """Публікує чергу по порядку; після помилки решта чекає RETRY_AFTER."""
+        if time.monotonic() < self._down_until:
+            return
+        try:
+            redis = await self._get_publisher()
+            if self._overflowed:
+                await redis.publish(CHANNEL, self._message(f"{FLUSH}:*"))
+                self._overflowed = False
+            while self._pending:
+                message = self._pending.popleft()
+                try:
+                    await redis.publish(CHANNEL, message)
+                except BaseException:
+                    self._pending.appendleft(message)
+                    raise
+        except (RedisError, OSError) as exc:
+            self._down_until = time.monotonic() + RETRY_AFTER
+            metrics.inc("cache_invalidation_publish_errors")
+            logger.warning(
+                "Invalidation publish failed, %d event(s) queued: %s",
+                len(self._pending),
+                exc,
+            )
+
+    def _handle(self, data: bytes) -> None:
+        try:
+            message = json.loads(data)
+            if message["origin"] == self.origin:
+                return
+            kind, key = message["event"].split(":", 1)
+            self._dispatch(kind, key)
+        except Exception:
+            logger.exception("Bad invalidation message: %r", data)
+
+    async def run(self, max_backoff: float = 30) -> None:
+        """Слухає канал до скасування; перепідключається з backoff."""
+        delay = 1.0
+        while True:
+            try:
+                redis = await self._get_redis()
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    # поки нас не було в каналі, події могли загубитись
+                    self.flush_local()
+                    self._down_until = 0.0  # Redis доступний — пробуємо чергу одразу
+                    await self._flush_pending()
+                    delay = 1.0
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=RETRY_AFTER
+                        )
+                        if message is not None:
+                            self._handle(message["data"])
+                        elif self._pending or self._overflowed:
+                            await self._flush_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Invalidation bus disconnected, retry in %ss", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_backoff)
+
+
+invalidation_bus = InvalidationBus(settings.REDIS_URL)
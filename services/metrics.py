@@ -0,0 +1,73 @@
+"""Прості метрики процесу у форматі Prometheus (GET /metrics з METRICS_TOKEN).
+
+Лічильники та summary (count/sum/max) з мітками. Кожен воркер
+віддає власні значення.
+"""
+
+import threading
+
+_lock = threading.Lock()
+_counters: dict[tuple[str, tuple], float] = {}
+# (name, labels) -> [count, sum, max]
+_summaries: dict[tuple[str, tuple], list[float]] = {}
+
+
+def _key(name: str, labels: dict) -> tuple[str, tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name: str, value: float, **labels) -> None:
+    key = _key(name, labels)
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is None:
+            _summaries[key] = [1, value, value]
+        else:
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+
+
+def value(name: str, **labels) -> float:
+    return _counters.get(_key(name, labels), 0)
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels
+    )
+    return "{" + inner + "}"
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        summaries = sorted(_summaries.items())
+    typed = set()
+    for (name, labels), total in counters:
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_labels(labels)} {total}")
+    for (name, labels), (count, total, _) in summaries:
+        if name not in typed:
+            lines.append(f"# TYPE {name} summary")
+            typed.add(name)
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+    for (name, labels), (_, _, maximum) in summaries:
+        if name + "_max" not in typed:
+            lines.append(f"# TYPE {name}_max gauge")
+            typed.add(name + "_max")
+        lines.append(f"{name}_max{_labels(labels)} {maximum}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,36 @@
+"""Нормалізація телефонів до цифр E.164 (без "+").
+
+    "+380 (67) 123-45-67" -> "380671234567"
+    "067 123 4567"        -> "380671234567"  (код країни за замовчуванням)
+    "00 44 20 7946 0958"  -> "442079460958"
+"""
+
+import re
+
+_NON_DIGITS = re.compile(r"\D")
+
+E164_MAX_DIGITS = 15
+NATIONAL_MIN_DIGITS = 9  # коротші номери (внутрішні, короткі) не доповнюємо
+
+
+def normalize_phone(raw: str | None, default_country_code: str = "380") -> str | None:
+    if not raw:
+        return None
+    raw = raw.strip()
+    digits = _NON_DIGITS.sub("", raw)
+    if not digits:
+        return None
+
+    if raw.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith(default_country_code) and len(digits) > 10:
+        pass  # міжнародний формат без "+"
+    elif len(digits.lstrip("0")) >= NATIONAL_MIN_DIGITS:
+        # національний формат: відкидаємо trunk-префікс 0
+        digits = default_country_code + digits.lstrip("0")
+
+    if len(digits) > E164_MAX_DIGITS:
+        return None
+    return digits
@@ -0,0 +1,116 @@
+"""Фонетичні ключі імен для нечіткого пошуку.
+
+Для імені зберігаються два ключі (models.Contact, оновлюються на запис):
+
+- phonetic — первинний код Double Metaphone латинського написання:
+  "Олександр", "Olexandr", "Alexander" -> "ALKSNTR";
+- translit — транслітерація, зведена до однієї форми варіантів
+  написання (x/ks, w/v, kh/h, y/j/i, подвоєння літер):
+  "Юрій", "Yuriy", "Jurij" -> "iuri".
+
+Нечіткий пошук (crud.fuzzy_search_contact_rows) шукає за цими ключами
+через індекси, а кандидатів упорядковує за відстанню редагування.
+"""
+
+import re
+import unicodedata
+
+from metaphone import doublemetaphone
+
+PHONETIC_MAX = 32
+TRANSLIT_MAX = 100
+
+# українська й російська кирилиця -> латиниця (близько до паспортної)
+_CYRILLIC = str.maketrans(
+    {
+        **dict(zip("абвгґдезиіїйклмнопрстуфыэё", "abvhgdezyiiiklmnoprstufyee")),
+        "є": "ie",
+        "ж": "zh",
+        "х": "kh",
+        "ц": "ts",
+        "ч": "ch",
+        "ш": "sh",
+        "щ": "shch",
+        "ю": "iu",
+        "я": "ia",
+        **dict.fromkeys("ьъ'’ʼ", ""),
+    }
+)
+
+# варіанти латинського написання одного звуку -> одна форма
+_FOLD = [
+    ("shch", "sch"),
+    ("kh", "h"),
+    ("ph", "f"),
+    ("ck", "k"),
+    ("x", "ks"),
+    ("w", "v"),
+    ("q", "k"),
+    ("g", "h"),
+    ("j", "i"),
+    ("y", "i"),
+]
+_REPEATS = re.compile(r"(.)\1+")
+_NON_LETTERS = re.compile(r"[^a-z]")
+_WORDS = re.compile(r"[^\W\d_]+")
+
+
+def latin(text: str) -> str:
+    """Латинське написання в нижньому регістрі, без діакритики."""
+    text = text.lower().translate(_CYRILLIC)
+    text = unicodedata.normalize("NFKD", text)
+    return _NON_LETTERS.sub("", text)
+
+
+def translit_key(text: str | None) -> str | None:
+    if not text:
+        return None
+    key = latin(text)
+    for old, new in _FOLD:
+        key = key.replace(old, new)
+    key = _REPEATS.sub(r"\1", key)
+    return key[:TRANSLIT_MAX] or None
+
+
+def phonetic_codes(text: str | None) -> tuple[str, ...]:
+    """Коди Double Metaphone (первинний і, якщо є, альтернативний)."""
+    if not text:
+        return ()
+    codes = (c.strip()[:PHONETIC_MAX] for c in doublemetaphone(latin(text)))
+    return tuple(dict.fromkeys(c for c in codes if c))
+
+
+def phonetic_key(text: str | None) -> str | None:
+    codes = phonetic_codes(text)
+    return codes[0] if codes else None
+
+
+def query_keys(query: str) -> tuple[list[str], list[str], list[str]]:
+    """(коди Metaphone, ключі транслітерації, слова) пошукового рядка."""
+    words = [w for w in _WORDS.findall(query) if translit_key(w)]
+    phonetic = {code for w in words for code in phonetic_codes(w)}
+    translit = {translit_key(w) for w in words}
+    return sorted(phonetic), sorted(translit), [translit_key(w) for w in words]
+
+
+def distance(a: str, b: str) -> int:
+    """Відстань Левенштейна."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            )
+        previous = current
+    return previous[-1]
+
+
+def score(words: list[str], first: str | None, last: str | None) -> int:
+    """Сума найменших відстаней кожного слова запиту до імені чи прізвища."""
+    names = [n for n in (first, last) if n]
+    if not names:
+        return len("".join(words))
+    return sum(min(distance(w, n) for n in names) for w in words)
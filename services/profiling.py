@@ -0,0 +1,150 @@
+"""Профілювання окремих запитів на вимогу.
+
+Семплер — окремий потік, який кожні PROFILING_INTERVAL_MS мс знімає стек
+потоку event loop (sys._current_frames) і рахує однакові стеки. Це
+wall-clock профіль: очікування I/O видно як кадри селектора, а якщо
+паралельно виконувались інші запити, їхні стеки теж потрапляють у
+семпли. Одночасно профілюється лише один запит.
+
+Останні PROFILING_KEEP профілів зберігаються в пам'яті воркера і
+віддаються з /admin/profiles як collapsed stacks (flamegraph.pl,
+speedscope) або HTML.
+"""
+
+import html
+import itertools
+import os
+import sys
+import threading
+from collections import Counter, deque
+
+from config import settings
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profiling-sampler", daemon=True
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_collapse(frame)] += 1
+            del frame
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+class Profile:
+    __slots__ = (
+        "id", "method", "path", "status", "started", "duration", "interval",
+        "samples",
+    )
+
+    def __init__(self, method, path, status, started, duration, interval, samples):
+        self.id = 0
+        self.method = method
+        self.path = path
+        self.status = status
+        self.started = started
+        self.duration = duration
+        self.interval = interval
+        self.samples = samples
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started": self.started,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": sum(self.samples.values()),
+        }
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.most_common()
+        )
+
+    def html(self, limit: int = 50) -> str:
+        """Топ функцій за self- і total-семплами."""
+        own, total = Counter(), Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        n = max(sum(self.samples.values()), 1)
+
+        def table(title, counter):
+            rows = "".join(
+                f"<tr><td>{count}</td><td>{100 * count / n:.1f}%</td>"
+                f"<td><code>{html.escape(frame)}</code></td></tr>"
+                for frame, count in counter.most_common(limit)
+            )
+            return (
+                f"<h2>{title}</h2><table><tr><th>samples</th><th>%</th>"
+                f"<th>frame</th></tr>{rows}</table>"
+            )
+
+        return (
+            f"<html><body><h1>{html.escape(self.method)} {html.escape(self.path)}"
+            f" — {self.duration * 1000:.1f} ms, status {self.status}, "
+            f"{n} samples × {self.interval * 1000:g} ms</h1>"
+            f"{table('Self', own)}{table('Total', total)}</body></html>"
+        )
+
+
+class ProfileStore:
+    def __init__(self, keep: int):
+        self._profiles: deque[Profile] = deque(maxlen=keep)
+        self._ids = itertools.count(1)
+        self._busy = threading.Lock()
+
+    def try_begin(self) -> bool:
+        # семплер один на процес: інші запити в цей час не профілюються
+        return self._busy.acquire(blocking=False)
+
+    def end(self, profile: Profile) -> None:
+        profile.id = next(self._ids)
+        self._profiles.append(profile)
+        self._busy.release()
+
+    def list(self) -> list[dict]:
+        return [profile.summary() for profile in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Profile | None:
+        return next((p for p in self._profiles if p.id == profile_id), None)
+
+
+def enabled() -> bool:
+    return bool(settings.PROFILING_TOKEN) or settings.PROFILING_SAMPLE_RATE > 0
+
+
+profile_store = ProfileStore(settings.PROFILING_KEEP)
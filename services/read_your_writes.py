@@ -0,0 +1,78 @@
+"""Read-your-writes між воркерами: після commit із записом читання цього
+користувача READ_YOUR_WRITES_SECONDS ідуть у primary, а не в репліку.
+
+Позначка зберігається в Redis з TTL (ключ ryw:<user_id>), тож її бачить
+будь-який воркер, на який потрапить наступний запит. Локальна копія —
+швидкий шлях для того ж воркера і запасний варіант, поки Redis
+недоступний; прострочені записи з неї регулярно прибираються.
+"""
+
+import logging
+import time
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from config import settings
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "ryw:"
+RETRY_AFTER = 5  # секунд без звернень до Redis після помилки
+
+
+class ReadYourWrites:
+    def __init__(self, redis_url: str, window: float):
+        self.redis_url = redis_url
+        self.window = window
+        self._redis = None
+        # user_id -> time.monotonic(), до якого читання йдуть у primary
+        self._local: dict[int, float] = {}
+        self._swept_at = 0.0
+        self._down_until = 0.0
+
+    async def _get_redis(self):
+        if self._redis is None:
+            self._redis = await aioredis.from_url(
+                self.redis_url, socket_connect_timeout=1, socket_timeout=1
+            )
+        return self._redis
+
+    async def _call(self, method: str, *args, **kwargs):
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            redis = await self._get_redis()
+            return await getattr(redis, method)(*args, **kwargs)
+        except (RedisError, OSError) as exc:
+            self._down_until = time.monotonic() + RETRY_AFTER
+            metrics.inc("read_your_writes_redis_errors")
+            logger.warning("Read-your-writes marker unavailable in Redis: %s", exc)
+            return None
+
+    def _remember_local(self, user_id: int) -> None:
+        now = time.monotonic()
+        self._local[user_id] = now + self.window
+        if now - self._swept_at >= self.window:
+            self._swept_at = now
+            self._local = {u: d for u, d in self._local.items() if d > now}
+
+    async def mark(self, user_id: int) -> None:
+        if self.window <= 0:
+            return
+        self._remember_local(user_id)
+        await self._call("set", f"{PREFIX}{user_id}", 1, px=int(self.window * 1000))
+
+    async def recently_wrote(self, user_id: int | None) -> bool:
+        if user_id is None or self.window <= 0:
+            return False
+        deadline = self._local.get(user_id)
+        if deadline is not None:
+            if deadline > time.monotonic():
+                return True
+            self._local.pop(user_id, None)
+        return bool(await self._call("exists", f"{PREFIX}{user_id}"))
+
+
+read_your_writes = ReadYourWrites(settings.REDIS_URL, settings.READ_YOUR_WRITES_SECONDS)
@@ -0,0 +1,192 @@
+"""Відкликання refresh-токенів.
+
+Відкликані jti лежать у Redis: ключ ``revoked_jti:<jti>`` (з TTL до кінця
+життя токена) для точної перевірки і stream ``revoked_jti_log`` для
+синхронізації. Кожен воркер тримає Bloom-фільтр, який періодично
+довантажує записи stream після останнього прочитаного id, тож перевірка
+не-відкликаного токена (майже всі запити) не ходить у мережу. Redis
+питаємо тільки коли фільтр каже "можливо".
+
+Id записів stream призначає сам Redis і вони лише зростають, тому курсор
+воркера не може обігнати запис, що закомітився пізніше чи прийшов з
+хоста з відсталим годинником.
+
+Поки Redis недоступний, воркер далі відповідає з останнього збудованого
+фільтра: "точно не відкликаний" лишається правдою для всіх jti, що були
+у stream на момент синхронізації. Відмовляємо лише токенам, які фільтр
+вважає "можливо відкликаними", і всім — коли фільтра ще немає або він
+не синхронізувався довше за REVOCATION_MAX_STALENESS. Відмови рахуються
+метрикою revocation_check_refused, а не логуються на кожен запит.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from config import settings
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+REVOKED_KEY = "revoked_jti:{}"
+REVOKED_LOG = "revoked_jti_log"
+# sorted set (score — час відкликання) до переходу на stream; читається
+# при rebuild, поки його записи не застаріють
+LEGACY_SET = "revoked_jti"
+READ_BATCH = 10_000
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    def __init__(
+        self,
+        redis_url: str,
+        capacity: int,
+        sync_interval: float,
+        max_token_age: float,
+        max_staleness: float,
+    ):
+        self.redis_url = redis_url
+        self.capacity = capacity
+        self.sync_interval = sync_interval
+        self.max_token_age = max_token_age
+        self.max_staleness = max_staleness
+        self._redis = None
+        self._bloom: BloomFilter | None = None
+        self._synced_at = 0.0  # час останньої синхронізації (time.monotonic)
+        self._attempted_at = -math.inf  # час останньої спроби, навіть невдалої
+        self._cursor = "0-0"  # id запису stream, до якого jti вже у фільтрі
+        self._rebuilt_at = 0.0
+        self._sync_task: asyncio.Task | None = None
+
+    async def _get_redis(self):
+        if self._redis is None:
+            self._redis = await aioredis.from_url(
+                self.redis_url, socket_connect_timeout=1, socket_timeout=1
+            )
+        return self._redis
+
+    async def _load(self, r, bloom: BloomFilter, after: str) -> str:
+        """Додає у фільтр записи stream після id after; повертає останній id."""
+        while True:
+            entries = await r.xrange(REVOKED_LOG, min=f"({after}", count=READ_BATCH)
+            for entry_id, fields in entries:
+                bloom.add(fields[b"jti"].decode())
+                after = entry_id.decode()
+            if len(entries) < READ_BATCH:
+                return after
+
+    async def rebuild(self) -> None:
+        """Повне перезавантаження фільтра (прибирає прострочені jti)."""
+        r = await self._get_redis()
+        # межа за годинником Redis: ним же призначені id записів
+        seconds, _ = await r.time()
+        oldest = int((seconds - self.max_token_age) * 1000)
+        await r.xtrim(REVOKED_LOG, minid=oldest, approximate=True)
+        bloom = BloomFilter(self.capacity)
+        cursor = await self._load(r, bloom, "0-0")
+        await r.zremrangebyscore(LEGACY_SET, "-inf", seconds - self.max_token_age)
+        for jti in await r.zrange(LEGACY_SET, 0, -1):
+            bloom.add(jti.decode())
+        self._bloom, self._cursor = bloom, cursor
+        self._synced_at = self._rebuilt_at = time.monotonic()
+
+    async def sync(self) -> None:
+        """Довантажує jti, відкликані після попередньої синхронізації."""
+        if self._bloom is None or time.monotonic() - self._rebuilt_at > self.max_token_age:
+            await self.rebuild()
+            return
+        r = await self._get_redis()
+        self._cursor = await self._load(r, self._bloom, self._cursor)
+        self._synced_at = time.monotonic()
+
+    async def _sync_quietly(self) -> None:
+        try:
+            await self.sync()
+        except (RedisError, OSError) as exc:
+            metrics.inc("revocation_sync_errors")
+            logger.warning("Revocation list sync failed: %s", exc)
+
+    def _schedule_sync(self) -> asyncio.Task | None:
+        """Запускає синхронізацію не частіше за sync_interval (і після помилки
+        теж); повертає задачу, що виконується, якщо така є."""
+        running = self._sync_task is not None and not self._sync_task.done()
+        now = time.monotonic()
+        if not running and now - self._attempted_at >= self.sync_interval:
+            self._attempted_at = now
+            self._sync_task = asyncio.create_task(self._sync_quietly())
+            running = True
+        return self._sync_task if running else None
+
+    async def _current_filter(self) -> BloomFilter | None:
+        """Фільтр, якому можна вірити, або None."""
+        task = self._schedule_sync()
+        if self._bloom is None and task is not None:
+            # першу побудову чекають усі запити воркера, але виконується одна
+            await asyncio.shield(task)
+        stale = time.monotonic() - self._synced_at > self.max_staleness
+        if self._bloom is None or stale:
+            return None
+        return self._bloom
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        ttl = int(expires_at - time.time())
+        if ttl <= 0:
+            return
+        r = await self._get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.set(REVOKED_KEY.format(jti), 1, ex=ttl)
+            pipe.xadd(REVOKED_LOG, {"jti": jti})
+            await pipe.execute()
+        if self._bloom is not None:
+            self._bloom.add(jti)
+
+    async def is_revoked(self, jti: str | None) -> bool:
+        if not jti:
+            return True  # токени без jti не можна відкликати — не приймаємо
+        bloom = await self._current_filter()
+        if bloom is None:
+            metrics.inc("revocation_check_refused", reason="stale")
+            return True
+        if jti not in bloom:
+            return False
+        # "можливо відкликаний" — уточнюємо в Redis
+        try:
+            r = await self._get_redis()
+            return bool(await r.exists(REVOKED_KEY.format(jti)))
+        except (RedisError, OSError):
+            metrics.inc("revocation_check_refused", reason="redis")
+            return True
+
+
+revocation_list = RevocationList(
+    settings.REDIS_URL,
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    sync_interval=settings.REVOCATION_SYNC_INTERVAL,
+    max_token_age=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600,
+    max_staleness=settings.REVOCATION_MAX_STALENESS,
+)
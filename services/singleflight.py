@@ -0,0 +1,75 @@
+"""Single-flight: однакові одночасні читання в межах воркера виконуються
+один раз, а результат отримують усі, хто чекав.
+
+Ключ — (операція, фабрика сесій, аргументи); фабрика входить у ключ, щоб
+читання з репліки не віддавалось тому, хто мусить читати з primary
+(read-your-writes). Спільний виклик іде у власній сесії
+(database.fork_session), а не в сесії першого запиту: той може
+завершитись або бути скасованим раніше за інших. Скасування одного з
+тих, хто чекає, не зачіпає решту; виклик скасовується, коли не лишилось
+жодного. Виняток виклику отримують усі.
+
+Використовується лише для функцій, що повертають незмінні рядки
+(crud.*_rows), — ORM-об'єкти не можна ділити між запитами.
+"""
+
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import fork_session
+from services import metrics
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: dict[tuple, _Flight] = {}
+
+    def _forget(self, key: tuple, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def do(self, key: tuple, call):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            metrics.inc("singleflight_coalesced", operation=key[0])
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # усі, хто чекав, скасовані — результат нікому не потрібен
+                self._forget(key, flight)
+                flight.task.cancel()
+
+
+single_flight = SingleFlight()
+
+
+async def coalesce(db: AsyncSession, fn, *args, **kwargs) -> list:
+    """fn(db, *args, **kwargs) через single_flight; для сесій поза запитом
+    (без фабрики в db.info) — звичайний виклик."""
+    factory = db.info.get("factory")
+    if factory is None:
+        return await fn(db, *args, **kwargs)
+    key = (fn.__qualname__, id(factory), args, tuple(sorted(kwargs.items())))
+
+    async def call():
+        async with fork_session(db) as session:
+            return await fn(session, *args, **kwargs)
+
+    # копія списку: рядки незмінні, але сам список кожен отримує свій
+    return list(await single_flight.do(key, call))
@@ -0,0 +1,116 @@
+"""Вбудований режим на одному вузлі: DATABASE_URL=sqlite+aiosqlite:///contacts.db.
+
+Кожне нове з'єднання отримує WAL і налаштовані pragmas (configure). У WAL
+читачі не блокують письменника і навпаки, але письменник одночасно лише
+один. Тому транзакції на запис у межах воркера стають у чергу
+(install_writer_queue) ще до першого INSERT/UPDATE/DELETE і тримають її до
+кінця транзакції — замість того, щоб крутитись у busy handler SQLite і
+зрештою отримати "database is locked". Між воркерами чергу тримає сама
+SQLite через busy_timeout.
+
+pysqlite (а з ним aiosqlite) відкриває транзакцію лише перед першим
+записом, тож SELECT-и до нього не тримають знімок бази, і запис не
+впирається в SQLITE_BUSY_SNAPSHOT.
+"""
+
+import asyncio
+import time
+import weakref
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.util import await_only
+
+from config import settings
+from services import metrics
+
+
+def pragmas() -> list[str]:
+    return [
+        "journal_mode=WAL",
+        f"synchronous={settings.SQLITE_SYNCHRONOUS}",
+        # від'ємне значення — розмір у KiB, а не в сторінках
+        f"cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        f"mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        "foreign_keys=ON",
+        "temp_store=MEMORY",
+    ]
+
+
+def set_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in pragmas():
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+def configure(engine: AsyncEngine) -> None:
+    """Pragmas для кожного нового з'єднання; для інших СУБД нічого не робить."""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", set_pragmas)
+
+
+# --- черга письменників ---
+# asyncio.Lock прив'язується до циклу подій, тож свій на кожен цикл
+_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _writer_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _locks.get(loop)
+    if lock is None:
+        lock = _locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def _acquire(lock: asyncio.Lock) -> None:
+    async with asyncio.timeout(settings.SQLITE_WRITER_TIMEOUT):
+        await lock.acquire()
+
+
+def _begin_write(session, bind_arguments=None) -> None:
+    if "sqlite_writer" in session.info:
+        return
+    # спершу з'єднання, потім черга: навпаки власник черги чекав би на пул,
+    # зайнятий тими, хто стоїть у черзі. Заодно починається транзакція
+    # сесії — її кінець (after_transaction_end) звільняє чергу.
+    session.connection(bind_arguments=bind_arguments)
+    lock = _writer_lock()
+    started = time.perf_counter()
+    try:
+        # хуки сесії синхронні, але виконуються в greenlet AsyncSession
+        await_only(_acquire(lock))
+    except TimeoutError:
+        metrics.inc("sqlite_writer_timeouts")
+        raise HTTPException(
+            status_code=503,
+            detail="Database is busy, try again shortly",
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+        )
+    metrics.observe("sqlite_writer_wait_seconds", time.perf_counter() - started)
+    session.info["sqlite_writer"] = lock
+
+
+def _statement_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        _begin_write(orm_execute_state.session, orm_execute_state.bind_arguments)
+
+
+def _flush_write(session, flush_context, instances):
+    _begin_write(session)
+
+
+def _end_write(session, transaction):
+    if transaction.parent is None and "sqlite_writer" in session.info:
+        session.info.pop("sqlite_writer").release()
+
+
+def install_writer_queue(session_class) -> None:
+    """Підключає чергу письменників до сесій session_class."""
+    event.listen(session_class, "do_orm_execute", _statement_write)
+    event.listen(session_class, "before_flush", _flush_write)
+    event.listen(session_class, "after_transaction_end", _end_write)
@@ -0,0 +1,186 @@
+"""Дельта-синхронізація контактів (GET /contacts/sync).
+
+Кожен запис у contacts через crud.py бере наступну версію власника
+(contact_sync_state.version) атомарним UPDATE ... RETURNING у тій самій
+транзакції і записує її в contacts.row_version; видалення лишає запис у
+contact_tombstones з такою ж версією. Блокування рядка лічильника
+тримається до commit, тож версії комітяться у порядку зростання і
+клієнт, який пам'ятає курсор (останню отриману версію), не пропустить
+змін.
+
+Старі tombstones прибираються, а floor піднімається до найбільшої
+прибраної версії; клієнти з курсором нижче floor отримують reset і
+синхронізуються з нуля:
+
+    python -m services.sync prune
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models import Contact, ContactSyncState, ContactTombstone
+
+
+async def next_version(db: AsyncSession, owner_id: int) -> int:
+    """Наступна версія власника (без commit — транзакція викликача)."""
+    stmt = (
+        update(ContactSyncState)
+        .where(ContactSyncState.owner_id == owner_id)
+        .values(version=ContactSyncState.version + 1)
+        .returning(ContactSyncState.version)
+    )
+    version = (await db.execute(stmt)).scalar_one_or_none()
+    if version is not None:
+        return version
+    # першого рядка ще немає; паралельний запис міг встигнути раніше
+    try:
+        async with db.begin_nested():
+            await db.execute(
+                insert(ContactSyncState).values(owner_id=owner_id, version=1, floor=0)
+            )
+        return 1
+    except IntegrityError:
+        return (await db.execute(stmt)).scalar_one()
+
+
+async def record_delete(db: AsyncSession, contact: Contact) -> None:
+    db.add(
+        ContactTombstone(
+            owner_id=contact.owner_id,
+            row_version=await next_version(db, contact.owner_id),
+            contact_id=contact.id,
+        )
+    )
+
+
+async def changes_since(
+    db: AsyncSession, owner_id: int, cursor: int, limit: int
+) -> dict:
+    """Контакти, змінені після cursor, і id видалених, за зростанням версії."""
+    state = (
+        await db.execute(
+            select(ContactSyncState.version, ContactSyncState.floor).where(
+                ContactSyncState.owner_id == owner_id
+            )
+        )
+    ).first()
+    high, floor = state if state else (0, 0)
+    if cursor and (cursor < floor or cursor > high):
+        return {
+            "reset": True,
+            "cursor": 0,
+            "has_more": True,
+            "changed": [],
+            "deleted": [],
+        }
+
+    # лише версії <= high: усі вони вже закомічені й видимі обом запитам
+    changed = (
+        await db.execute(
+            select(Contact)
+            .where(
+                Contact.owner_id == owner_id,
+                Contact.row_version > cursor,
+                Contact.row_version <= high,
+            )
+            .order_by(Contact.row_version)
+            .limit(limit + 1)
+        )
+    ).scalars().all()
+    deleted = (
+        await db.execute(
+            select(ContactTombstone.row_version, ContactTombstone.contact_id)
+            .where(
+                ContactTombstone.owner_id == owner_id,
+                ContactTombstone.row_version > cursor,
+                ContactTombstone.row_version <= high,
+            )
+            .order_by(ContactTombstone.row_version)
+            .limit(limit + 1)
+        )
+    ).all()
+
+    # (версія, контакт або None, id видаленого або None)
+    items = sorted(
+        [(c.row_version, c, None) for c in changed]
+        + [(v, None, contact_id) for v, contact_id in deleted],
+        key=lambda item: item[0],
+    )
+    has_more = len(items) > limit
+    items = items[:limit]
+    return {
+        "reset": False,
+        "cursor": items[-1][0] if has_more else high,
+        "has_more": has_more,
+        "changed": [c for _, c, _ in items if c is not None],
+        "deleted": [i for _, _, i in items if i is not None],
+    }
+
+
+async def reset(conn, owner_id: int) -> None:
+    """Робить недійсними всі курсори власника (після перенесення на інший
+    шард контакти отримують нові id). conn — AsyncConnection у транзакції."""
+    state = ContactSyncState.__table__
+    top = (
+        await conn.execute(
+            select(func.coalesce(func.max(Contact.row_version), 0)).where(
+                Contact.owner_id == owner_id
+            )
+        )
+    ).scalar_one()
+    await conn.execute(
+        delete(ContactTombstone.__table__).where(
+            ContactTombstone.owner_id == owner_id
+        )
+    )
+    await conn.execute(delete(state).where(state.c.owner_id == owner_id))
+    await conn.execute(
+        insert(state).values(owner_id=owner_id, version=top + 1, floor=top + 1)
+    )
+
+
+async def prune(conn, older_than: datetime) -> int:
+    """Видаляє tombstones, старші за older_than, і піднімає floor власників."""
+    tombstones = ContactTombstone.__table__
+    state = ContactSyncState.__table__
+    pruned = (
+        await conn.execute(
+            select(tombstones.c.owner_id, func.max(tombstones.c.row_version))
+            .where(tombstones.c.deleted_at < older_than)
+            .group_by(tombstones.c.owner_id)
+        )
+    ).all()
+    for owner_id, version in pruned:
+        await conn.execute(
+            update(state)
+            .where(state.c.owner_id == owner_id)
+            .values(floor=case((state.c.floor < version, version), else_=state.c.floor))
+        )
+    result = await conn.execute(
+        delete(tombstones).where(tombstones.c.deleted_at < older_than)
+    )
+    return result.rowcount
+
+
+async def _main() -> None:
+    from database import engine, shards
+
+    older_than = datetime.utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    engines = set(shards.engines.values()) if shards.enabled else {engine}
+    total = 0
+    for e in engines:
+        async with e.begin() as conn:
+            total += await prune(conn, older_than)
+    print(f"{total} tombstones pruned")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["prune"]:
+        sys.exit(__doc__)
+    asyncio.run(_main())
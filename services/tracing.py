@@ -0,0 +1,381 @@
+"""Легке трасування запитів (W3C trace context, без зовнішніх залежностей).
+
+TracingMiddleware відкриває кореневий span запиту: рішення про семплування
+береться з вхідного заголовка traceparent, інакше — з імовірністю
+TRACING_SAMPLE_RATE. Прапор sampled у заголовку задає клієнт, тож такі
+трейси обмежені TRACING_FORCED_PER_SECOND на воркер. Поточний span живе
+в ContextVar, тож span() і @traced усередині запиту автоматично стають
+дочірніми; для несемплованого запиту вони нічого не роблять, крім
+перевірки ContextVar.
+
+Завершені span'и віддаються експортерам із TRACING_EXPORTERS:
+
+    memory — кільцевий буфер воркера, GET /admin/traces
+    file   — JSON lines у TRACING_FILE
+    otlp   — OTLP/HTTP JSON на TRACING_OTLP_ENDPOINT (локальний collector)
+
+file і otlp пишуть з окремого потоку; при переповненій черзі span'и
+відкидаються (метрика tracing_spans_dropped).
+
+Вихідні HTTP-запити передають контекст заголовком current_traceparent().
+"""
+
+import abc
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from config import settings
+from services import metrics
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "start", "end",
+        "attributes", "error",
+    )
+
+    def __init__(self, trace_id: str, parent_id: str | None, name: str, attributes):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time_ns()
+        self.end = 0
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start,
+            "duration_ms": (self.end - self.start) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+# --- експортери ---
+class MemoryExporter:
+    def __init__(self, size: int):
+        self.spans: deque[Span] = deque(maxlen=size)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def traces(self, limit: int = 20) -> list[dict]:
+        """Останні трейси (новіші першими), span'и кожного за часом початку."""
+        grouped: dict[str, list[Span]] = {}
+        for span in reversed(self.spans):
+            if span.trace_id not in grouped:
+                if len(grouped) >= limit:
+                    continue
+                grouped[span.trace_id] = []
+            grouped[span.trace_id].append(span)
+        return [
+            {
+                "trace_id": trace_id,
+                "spans": [s.to_dict() for s in sorted(spans, key=lambda s: s.start)],
+            }
+            for trace_id, spans in grouped.items()
+        ]
+
+
+class _BackgroundExporter(abc.ABC):
+    """Черга + потік, що пише пачками; потік стартує ліниво в кожному
+    процесі (після fork воркера gunicorn потоки master не успадковуються)."""
+
+    batch_size = 512
+    flush_interval = 2.0
+
+    def __init__(self, max_queue: int = 10_000):
+        self._queue: queue.Queue[Span] = queue.Queue(max_queue)
+        self._pid = None
+
+    def export(self, span: Span) -> None:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name=type(self).__name__, daemon=True).start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            metrics.inc("tracing_spans_dropped", exporter=type(self).__name__)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception:
+                metrics.inc("tracing_export_errors", exporter=type(self).__name__)
+
+    @abc.abstractmethod
+    def write(self, batch: list[Span]) -> None:
+        """Записує пачку span'ів (у фоновому потоці)."""
+
+
+class JsonFileExporter(_BackgroundExporter):
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+    def write(self, batch: list[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in batch:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter(_BackgroundExporter):
+    """OTLP/HTTP з JSON-кодуванням (порт 4318 у OpenTelemetry Collector)."""
+
+    def __init__(self, endpoint: str, service_name: str):
+        super().__init__()
+        self.endpoint = endpoint
+        self.service_name = service_name
+
+    def _span(self, span: Span) -> dict:
+        data = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1 if span.parent_id else 2,  # INTERNAL / SERVER
+            "startTimeUnixNano": str(span.start),
+            "endTimeUnixNano": str(span.end),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()
+            ],
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        if span.error:
+            data["status"] = {"code": 2, "message": span.error}
+        return data
+
+    def write(self, batch: list[Span]) -> None:
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name",
+                             "value": {"stringValue": self.service_name}}
+                        ]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": "contacts"},
+                         "spans": [self._span(s) for s in batch]}
+                    ],
+                }
+            ]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=5):
+            pass
+
+
+def _build_exporters() -> tuple[MemoryExporter | None, list]:
+    names = {n.strip() for n in settings.TRACING_EXPORTERS.split(",") if n.strip()}
+    memory = MemoryExporter(settings.TRACING_BUFFER) if "memory" in names else None
+    exporters = [memory] if memory else []
+    if "file" in names:
+        exporters.append(JsonFileExporter(settings.TRACING_FILE))
+    if "otlp" in names:
+        exporters.append(
+            OtlpHttpExporter(settings.TRACING_OTLP_ENDPOINT, settings.TRACING_SERVICE_NAME)
+        )
+    return memory, exporters
+
+
+memory_exporter, _exporters = _build_exporters()
+
+
+def enabled() -> bool:
+    return bool(_exporters)
+
+
+def _finish(span: Span) -> None:
+    span.end = time.time_ns()
+    for exporter in _exporters:
+        exporter.export(span)
+
+
+class _RateLimit:
+    """Token bucket: не більше rate подій за секунду."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+_forced = _RateLimit(settings.TRACING_FORCED_PER_SECOND)
+
+
+# --- API ---
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    match = _TRACEPARENT.match(header.strip().lower()) if header else None
+    if not match or match.group(1) == "0" * 32:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def start_trace(name: str, traceparent: str | None, **attributes) -> Span | None:
+    """Кореневий span запиту або None, якщо запит не семплується."""
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+        # інакше будь-який клієнт вмикав би 100% семплування
+        if sampled and not _forced.take():
+            metrics.inc("tracing_forced_dropped")
+            sampled = False
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+        sampled = random.random() < settings.TRACING_SAMPLE_RATE
+    if not sampled:
+        return None
+    return Span(trace_id, parent_id, name, attributes)
+
+
+@contextmanager
+def activate(root: Span):
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as exc:
+        root.error = repr(exc)
+        raise
+    finally:
+        _current.reset(token)
+        _finish(root)
+
+
+def start_span(name: str, **attributes) -> Span | None:
+    """Дочірній span без активації (для листових операцій на кшталт SQL)."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    return Span(parent.trace_id, parent.span_id, name, attributes)
+
+
+def end_span(span: Span | None, error: BaseException | None = None) -> None:
+    if span is not None:
+        if error is not None:
+            span.error = repr(error)
+        _finish(span)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    parent = _current.get()
+    if parent is None:
+        yield _NOOP
+        return
+    child = Span(parent.trace_id, parent.span_id, name, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.error = repr(exc)
+        raise
+    finally:
+        _current.reset(token)
+        _finish(child)
+
+
+def traced(name: str | None = None):
+    """Декоратор: span навколо виклику функції (sync або async)."""
+
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_traceparent() -> str | None:
+    """Заголовок traceparent для вихідних HTTP-запитів."""
+    current = _current.get()
+    return current.traceparent() if current is not None else None
@@ -0,0 +1,434 @@
+"""Горизонтальне шардування контактів за owner_id.
+
+Таблиця users живе тільки в primary-базі, contacts розкладені по шардах
+(DATABASE_SHARD_URLS). Власник потрапляє на шард через consistent-hash ring,
+а таблиця owner_shards у primary зберігає винятки (pin) на час
+ребалансування.
+
+Ring і pins посилаються на шард за іменем, тож кожен шард має стале ім'я,
+незалежне від порядку в списку:
+
+    DATABASE_SHARD_URLS=shard0=postgresql+asyncpg://...,shard1=postgresql+asyncpg://...
+
+(для наявних розгортань — shard<i> за колишньою позицією в списку).
+Воркер не стартує, якщо в owner_shards є шард, якого немає в списку.
+
+Перенесення власників між шардами (онлайн, власник на час копіювання
+read-only):
+
+    python sharding.py freeze       # перед зміною DATABASE_SHARD_URLS
+    python sharding.py rebalance    # після деплою з новим списком шардів
+    python sharding.py move <owner_id> <shard>
+
+Схема шардів ведеться тим самим ланцюжком міграцій, що й primary:
+`alembic upgrade head` спершу мігрує primary, потім кожен шард із
+DATABASE_SHARD_URLS (`-x shard=<name>` — лише один шард). На шарді
+міграції пропускають таблиці, яких там немає (users, owner_shards,
+digest_*), а таблиці й колонки, які create_shard_schemas уже створив,
+не створюють вдруге, але backfill проганяють. Порядок оновлення:
+
+    alembic upgrade head            # primary і всі шарди, до деплою коду
+    # деплой; при старті create_shard_schemas лише створює нові шарди
+"""
+
+import asyncio
+import bisect
+import hashlib
+import re
+import sys
+import time
+
+from sqlalchemy import (
+    Column,
+    Index,
+    MetaData,
+    Table,
+    UniqueConstraint,
+    delete,
+    func,
+    insert,
+    select,
+)
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.sql import visitors
+
+from services import sqlite
+
+
+class HashRing:
+    """Consistent-hash ring з віртуальними вузлами."""
+
+    def __init__(self, nodes: list[str], vnodes: int = 100):
+        self.nodes = list(nodes)
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        ring = sorted(
+            (self._hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes)
+        )
+        for point, node in ring:
+            self._points.append(point)
+            self._owners.append(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def get(self, owner_id: int) -> str:
+        if not self._points:
+            raise LookupError("Hash ring is empty")
+        i = bisect.bisect(self._points, self._hash(str(owner_id)))
+        return self._owners[i % len(self._owners)]
+
+
+_SHARD_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def parse_shard_urls(value: str) -> dict[str, str]:
+    """DATABASE_SHARD_URLS ("name=url,name=url") -> {name: url}."""
+    shards = {}
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        name, sep, url = entry.partition("=")
+        name, url = name.strip(), url.strip()
+        if not sep or not _SHARD_NAME.fullmatch(name) or not url:
+            raise ValueError(
+                f"DATABASE_SHARD_URLS entry {entry!r} must be <name>=<url>"
+            )
+        if name in shards:
+            raise ValueError(f"Duplicate shard name {name!r} in DATABASE_SHARD_URLS")
+        shards[name] = url
+    return shards
+
+
+class ShardRouter:
+    """Визначає шард власника і відповідні binds для сесії."""
+
+    def __init__(
+        self,
+        urls: dict[str, str],
+        primary_engine,
+        primary_url: str,
+        directory_ttl: float = 5,
+        vnodes: int = 100,
+    ):
+        self.primary_engine = primary_engine
+        self.engines = {}
+        for name, url in urls.items():
+            if url == primary_url:
+                self.engines[name] = primary_engine
+                continue
+            shard_engine = create_async_engine(url, echo=False, future=True)
+            sqlite.configure(shard_engine)
+            self.engines[name] = shard_engine
+        self.ring = HashRing(list(self.engines), vnodes=vnodes)
+        self.directory_ttl = directory_ttl
+        # owner_id -> (expires_at, shard, read_only)
+        self._cache: dict[int, tuple[float, str, bool]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.engines)
+
+    async def locate(self, owner_id: int) -> tuple[str, bool]:
+        """(shard, read_only) для власника: pin з owner_shards або ring."""
+        now = time.monotonic()
+        cached = self._cache.get(owner_id)
+        if cached and cached[0] > now:
+            return cached[1], cached[2]
+
+        from models import OwnerShard
+
+        async with self.primary_engine.connect() as conn:
+            row = (
+                await conn.execute(
+                    select(OwnerShard.shard, OwnerShard.read_only).where(
+                        OwnerShard.owner_id == owner_id
+                    )
+                )
+            ).first()
+        if row is None:
+            shard, read_only = self.ring.get(owner_id), False
+        elif row.shard in self.engines:
+            shard, read_only = row.shard, bool(row.read_only)
+        else:
+            # не вгадувати: ring привів би власника на чужу базу
+            raise LookupError(
+                f"Owner {owner_id} is pinned to unknown shard {row.shard!r}"
+            )
+        self._cache[owner_id] = (now + self.directory_ttl, shard, read_only)
+        return shard, read_only
+
+    async def check_pins(self) -> None:
+        """Перевірка при старті: усі шарди з owner_shards є в DATABASE_SHARD_URLS."""
+        if not self.enabled:
+            return
+        from models import OwnerShard
+
+        async with self.primary_engine.connect() as conn:
+            pinned = set(
+                (await conn.execute(select(OwnerShard.shard).distinct())).scalars()
+            )
+        unknown = pinned - set(self.engines)
+        if unknown:
+            raise RuntimeError(
+                f"owner_shards references shards missing from DATABASE_SHARD_URLS: "
+                f"{', '.join(sorted(unknown))}"
+            )
+
+    async def route(self, owner_id: int | None) -> tuple[dict | None, bool]:
+        """binds для AsyncSession (Contact -> engine шарда) і read-only прапор."""
+        if not self.enabled or owner_id is None:
+            return None, False
+
+        from models import SHARDED_MODELS, Contact
+
+        shard, read_only = await self.locate(owner_id)
+        engine = self.engines[shard]
+        binds = {model: engine for model in (Contact, *SHARDED_MODELS)}
+        return binds, read_only
+
+    async def dispose(self) -> None:
+        for engine in self.engines.values():
+            if engine is not self.primary_engine:
+                await engine.dispose()
+
+
+# --- схема на шардах ---
+def shard_contacts_table(metadata: MetaData | None = None) -> Table:
+    """Копія таблиці contacts без FK на users (users є тільки в primary)."""
+    from models import Contact
+
+    source = Contact.__table__
+    table = Table(
+        source.name,
+        metadata or MetaData(),
+        *(
+            Column(
+                c.name,
+                c.type,
+                primary_key=c.primary_key,
+                nullable=c.nullable,
+                autoincrement=c.autoincrement,
+            )
+            for c in source.columns
+        ),
+    )
+
+    def rebind(element):
+        # колонки contacts -> колонки копії (і у виразах на кшталт lower(email))
+        if isinstance(element, Column) and element.table is source:
+            return table.c[element.name]
+        return None
+
+    for idx in source.indexes:
+        Index(
+            idx.name,
+            *(visitors.replacement_traverse(e, {}, rebind) for e in idx.expressions),
+            unique=idx.unique,
+        )
+    for cons in source.constraints:
+        if isinstance(cons, UniqueConstraint):
+            table.append_constraint(
+                UniqueConstraint(*(c.name for c in cons.columns), name=cons.name)
+            )
+    return table
+
+
+async def create_shard_schemas(router: ShardRouter) -> None:
+    """Створює відсутні таблиці на шардах. Колонки в наявних таблицях
+    create_all не додає — це робить `alembic upgrade head`."""
+    from models import SHARDED_MODELS
+
+    table = shard_contacts_table()
+    for model in SHARDED_MODELS:
+        model.__table__.to_metadata(table.metadata)
+    for engine in router.engines.values():
+        if engine is router.primary_engine:
+            continue
+        async with engine.begin() as conn:
+            await conn.run_sync(table.metadata.create_all)
+
+
+# --- міграції на шардах (alembic/env.py) ---
+def migrating_shard() -> str | None:
+    """Ім'я шарда, який зараз мігрує alembic; None — primary."""
+    from alembic import context
+
+    return context.config.attributes.get("shard")
+
+
+def shard_has(
+    table: str, column: str | None = None, index: str | None = None
+) -> bool:
+    """Чи є об'єкт у схемі шарда, що мігрує (у primary — завжди False).
+
+    Шарди досі створювались create_all, тож таблиця чи колонка могла
+    з'явитися там раніше за відповідну міграцію.
+    """
+    if migrating_shard() is None:
+        return False
+    from alembic import op
+    from sqlalchemy import inspect, text
+
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    if not inspector.has_table(table):
+        return False
+    if column is not None:
+        return column in {c["name"] for c in inspector.get_columns(table)}
+    if index is not None and bind.dialect.name == "sqlite":
+        # SQLite не відображає індекси за виразами (lower(email))
+        return bind.execute(
+            text(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'index' AND tbl_name = :table AND name = :index"
+            ),
+            {"table": table, "index": index},
+        ).first() is not None
+    if index is not None:
+        return index in {i["name"] for i in inspector.get_indexes(table)}
+    return True
+
+
+# --- ребалансування ---
+BATCH_SIZE = 1000
+
+
+async def _set_pin(owner_id: int, shard: str | None, read_only: bool = False):
+    from database import AsyncSessionLocal
+    from models import OwnerShard
+
+    async with AsyncSessionLocal() as db:
+        pin = await db.get(OwnerShard, owner_id)
+        if shard is None:
+            if pin is not None:
+                await db.delete(pin)
+        elif pin is None:
+            db.add(OwnerShard(owner_id=owner_id, shard=shard, read_only=read_only))
+        else:
+            pin.shard = shard
+            pin.read_only = read_only
+        await db.commit()
+
+
+async def _count(engine, table, owner_id: int) -> int:
+    async with engine.connect() as conn:
+        return (
+            await conn.execute(
+                select(func.count()).select_from(table).where(table.c.owner_id == owner_id)
+            )
+        ).scalar_one()
+
+
+async def move_owner(router: ShardRouter, owner_id: int, target: str) -> int:
+    """Переносить контакти власника на target. Повертає кількість рядків."""
+    from services import duplicates
+    from services.contact_stats import rebuild as rebuild_stats
+    from services.invalidation import invalidation_bus
+    from services.sync import reset as reset_sync
+
+    if target not in router.engines:
+        raise ValueError(f"Unknown shard {target!r}")
+    source, _ = await router.locate(owner_id)
+    if source == target:
+        return 0
+
+    table = shard_contacts_table()
+    columns = [c for c in table.columns if c.name != "id"]
+    src, dst = router.engines[source], router.engines[target]
+
+    # 1. власник read-only; чекаємо, поки всі воркери побачать pin
+    await _set_pin(owner_id, source, read_only=True)
+    await asyncio.sleep(router.directory_ttl + 1)
+
+    try:
+        # 2. копіюємо батчами (id призначає цільова база)
+        async with dst.begin() as dst_conn:
+            await dst_conn.execute(delete(table).where(table.c.owner_id == owner_id))
+            async with src.connect() as src_conn:
+                result = await src_conn.stream(
+                    select(*columns)
+                    .where(table.c.owner_id == owner_id)
+                    .order_by(table.c.id)
+                )
+                async for rows in result.partitions(BATCH_SIZE):
+                    await dst_conn.execute(insert(table), [r._asdict() for r in rows])
+
+        # 3. звіряємо кількість і перераховуємо статистику на новому шарді
+        moved = await _count(dst, table, owner_id)
+        if moved != await _count(src, table, owner_id):
+            raise RuntimeError(f"Row count mismatch while moving owner {owner_id}")
+        async with dst.begin() as dst_conn:
+            await rebuild_stats(dst_conn, owner_id)
+            # нові id на цільовому шарді — клієнти синхронізуються з нуля
+            await reset_sync(dst_conn, owner_id)
+            await duplicates.reset(dst_conn, owner_id)
+    except BaseException:
+        async with dst.begin() as dst_conn:
+            await dst_conn.execute(delete(table).where(table.c.owner_id == owner_id))
+        await _set_pin(owner_id, source, read_only=False)
+        raise
+
+    # 4. перемикаємо власника; pin не потрібен, якщо ring і так веде на target
+    await _set_pin(owner_id, None if router.ring.get(owner_id) == target else target)
+    await asyncio.sleep(router.directory_ttl + 1)
+    await invalidation_bus.publish("owner_contacts", owner_id)
+
+    # 5. прибираємо старі рядки
+    async with src.begin() as src_conn:
+        await src_conn.execute(delete(table).where(table.c.owner_id == owner_id))
+        await rebuild_stats(src_conn, owner_id)
+        await reset_sync(src_conn, owner_id)
+        await duplicates.reset(src_conn, owner_id)
+    return moved
+
+
+async def freeze(router: ShardRouter) -> int:
+    """Закріплює всіх власників за їх поточним шардом (до зміни списку шардів)."""
+    from database import AsyncSessionLocal
+    from models import OwnerShard, User
+
+    async with AsyncSessionLocal() as db:
+        pinned = set((await db.execute(select(OwnerShard.owner_id))).scalars())
+        ids = (await db.execute(select(User.id))).scalars().all()
+        new = [i for i in ids if i not in pinned]
+        db.add_all(OwnerShard(owner_id=i, shard=router.ring.get(i)) for i in new)
+        await db.commit()
+    return len(new)
+
+
+async def rebalance(router: ShardRouter) -> None:
+    from database import AsyncSessionLocal
+    from models import OwnerShard
+
+    async with AsyncSessionLocal() as db:
+        pins = (await db.execute(select(OwnerShard))).scalars().all()
+    for pin in pins:
+        target = router.ring.get(pin.owner_id)
+        if pin.shard == target:
+            await _set_pin(pin.owner_id, None)
+            continue
+        moved = await move_owner(router, pin.owner_id, target)
+        print(f"owner {pin.owner_id}: {pin.shard} -> {target} ({moved} contacts)")
+
+
+async def _main(argv: list[str]) -> None:
+    from database import shards
+
+    if not shards.enabled:
+        sys.exit("DATABASE_SHARD_URLS is not configured")
+    await shards.check_pins()
+    command = argv[0] if argv else ""
+    if command == "freeze":
+        print(f"pinned {await freeze(shards)} owners")
+    elif command == "rebalance":
+        await rebalance(shards)
+    elif command == "move" and len(argv) == 3:
+        moved = await move_owner(shards, int(argv[1]), argv[2])
+        print(f"moved {moved} contacts")
+    else:
+        sys.exit(__doc__)
+    await shards.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))